@@ -0,0 +1,1197 @@
+"""Benchmarks for the MuseumHub hot paths.
+
+Usage:
+    python bench.py                          # run every benchmark
+    python bench.py translate_warm my_tickets
+    python bench.py --json results.json      # also write the results as JSON
+    python bench.py --baseline baseline.json --threshold 0.25
+                                             # fail if a median got >25% slower
+
+Benchmarks run against fixtures built in a temporary directory: a SQLite
+database seeded with users and tickets (in place of the PostgreSQL one) and
+a translations database prefilled with cached rows. Fixture contents are
+derived from --seed, so runs are comparable.
+
+group_booking also runs against PostgreSQL when BENCH_POSTGRES_URL points at
+a scratch database (it creates the tables there and deletes its rows after).
+"""
+import argparse
+import atexit
+import concurrent.futures
+import http.client
+import itertools
+import json
+import logging
+import os
+import platform
+import queue
+import random
+import re
+import shutil
+import socket
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import statistics
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import create_engine, delete, insert
+from werkzeug.serving import make_server
+
+FIXTURE_DIR = tempfile.mkdtemp(prefix='museumhub-bench-')
+atexit.register(shutil.rmtree, FIXTURE_DIR, ignore_errors=True)
+# Every store the app opens lives in FIXTURE_DIR, so runs leave the working tree untouched
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(FIXTURE_DIR, 'museum.db')}"
+os.environ['DATABASE_PATH'] = os.path.join(FIXTURE_DIR, 'translations.db')
+os.environ['EMAIL_OUTBOX_PATH'] = os.path.join(FIXTURE_DIR, 'outbox.db')
+
+import app as museum
+from models import Booking, upgrade_schema, utc_now
+from app import (app, db, User, Ticket, PreTranslator, FastTranslator, LocalDictionaryBackend, EmailOutbox,
+                 SQLiteConnectionPool, MailCampaign, send_reminder_email)
+from chatbot import MuseumChatbot, ConversationStore, catalog_texts, INTENT_KEYWORDS
+from ticket_pdf import (generate_ticket_pdf, generate_ticket_pdf_platypus, TicketPDFCache, generate_group_tickets_pdf,
+                        iter_group_tickets_zip, group_jobs, group_ticket_workers, _render_group_pages)
+
+SEED = 1234
+
+# Same fallback as find_template_files: templates may sit next to app.py instead of in templates/
+if not os.path.isdir(os.path.join(app.root_path, app.template_folder)):
+    app.jinja_loader.searchpath = [app.root_path]
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """Register a benchmark function under a name"""
+    def decorator(func):
+        BENCHMARKS[name] = func
+        return func
+    return decorator
+
+
+def measure(func, repeat=20, warmup=2):
+    """Run func repeatedly and return latency statistics in milliseconds"""
+    for _ in range(warmup):
+        func()
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    return {
+        'repeat': repeat,
+        'min_ms': round(min(timings), 3),
+        'median_ms': round(statistics.median(timings), 3),
+        'mean_ms': round(statistics.mean(timings), 3),
+    }
+
+
+def sample_page_texts(count=150):
+    """Texts shaped like a page with many data-translate elements"""
+    return [f"Museum exhibit label number {i}" for i in range(count)]
+
+
+def sample_booking(visitors=4):
+    return {
+        'booking_id': 'MUS240001',
+        'visit_date': '12 March 2026',
+        'total_amount': '₹450',
+        'contact_phone': '+91 98765 43210',
+        'contact_email': 'visitor@example.com',
+        'visitors': [{'name': f'Visitor {i}', 'age': 20 + i} for i in range(visitors)],
+        'addons': 'Audio Guide, VR Experience',
+    }
+
+
+def make_translator(workdir):
+    """Create a PreTranslator backed by files inside workdir"""
+    app.config['ORIGINAL_TEXTS_PATH'] = os.path.join(workdir, 'original_texts.json')
+    translator = PreTranslator(os.path.join(workdir, 'translations.db'))
+    translator.fast_translator = FastTranslator(LocalDictionaryBackend())
+    return translator
+
+
+def prefilled_translator(workdir, rows=5000):
+    """make_translator with rows cached strings per language, sample_page_texts among them"""
+    translator = make_translator(workdir)
+    rng = random.Random(SEED)
+    texts = sample_page_texts() + [
+        f"Exhibit note {i} {rng.choice(['bronze', 'marble', 'ivory', 'textile'])} {rng.randrange(1000, 2000)}"
+        for i in range(rows - len(sample_page_texts()))
+    ]
+    for lang in ('kn', 'hi', 'fr'):
+        translator.cache_translations([(text, f"[{lang}] {text}") for text in texts], lang)
+    translator.memory_cache.clear()  # Start from the database like a freshly started server
+    return translator
+
+
+# Tickets per user for the seeded users, plus users with a handful of tickets each
+TICKET_FIXTURE_SIZES = (10, 1000, 10000)
+BACKGROUND_USERS = 200
+
+
+def seed_database():
+    """Create the schema and seed users and tickets in the fixture SQLite database.
+
+    Returns {ticket_count: user_id} for the users listed in TICKET_FIXTURE_SIZES.
+    """
+    rng = random.Random(SEED)
+    first_names = ['Asha', 'Ravi', 'Meera', 'Arjun', 'Kavya', 'Rahul', 'Divya', 'Kiran', 'Sneha', 'Vikram']
+    start = datetime(2026, 1, 1)
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        sizes = list(TICKET_FIXTURE_SIZES) + [rng.randrange(1, 6) for _ in range(BACKGROUND_USERS)]
+        users = {}
+        for n, size in enumerate(sizes):
+            user = User(username=f'bench_user_{n}', password='bench')
+            db.session.add(user)
+            db.session.flush()
+            if n < len(TICKET_FIXTURE_SIZES):
+                users[size] = user.id
+            db.session.execute(db.insert(Ticket), [
+                {
+                    'name': f"{rng.choice(first_names)} {i}",
+                    'age': rng.randrange(3, 85),
+                    'email': f'bench_user_{n}@example.com',
+                    'user_id': user.id,
+                    'created_at': start + timedelta(minutes=rng.randrange(0, 60 * 24 * 90)),
+                }
+                for i in range(size)
+            ])
+        db.session.commit()
+    return users
+
+
+def logged_in_client(user_id):
+    client = app.test_client()
+    with client.session_transaction() as flask_session:
+        flask_session['user_id'] = user_id
+        flask_session['username'] = f'user {user_id}'
+    return client
+
+
+# Messages a visitor might type, plus the chat buttons
+CHATBOT_MESSAGES = [
+    "hello", "Hi there!", "what can you do", "I want to book tickets for tomorrow",
+    "how do I log in", "sign up please", "show my tickets", "cancel my ticket",
+    "what are the ticket prices", "what time do you open", "where is the museum located",
+    "do you have audio guides or other facilities", "what are the photography rules",
+    "thanks, bye", "tell me a joke", "btn_main_menu", "btn_pricing_info", "btn_book_tickets",
+]
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP for smtplib: greeting, EHLO, MAIL, RCPT, DATA, QUIT"""
+
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        time.sleep(self.server.connect_latency)
+        self.reply('220 localhost SMTP stand-in')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors='replace').strip().upper()
+            if command.startswith(('EHLO', 'HELO')):
+                self.reply('250 localhost')
+            elif command.startswith(('MAIL', 'RCPT', 'RSET', 'NOOP')):
+                self.reply('250 OK')
+            elif command == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                message = []
+                while True:
+                    line = self.rfile.readline()
+                    if not line or line in (b'.\r\n', b'.\n'):
+                        break
+                    message.append(line)
+                time.sleep(self.server.latency)
+                if self.server.accept(b''.join(message)):
+                    self.reply('250 Queued')
+                else:
+                    self.reply('451 Try again later')
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+
+class LocalSMTPServer(socketserver.ThreadingTCPServer):
+    """Local SMTP stand-in on an ephemeral port.
+
+    Each connection is greeted after connect_latency seconds (standing in for
+    the TLS handshake and login) and each message is answered after latency
+    seconds; the next `failures` messages are refused with a 451.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, latency=0.0, failures=0, connect_latency=0.0):
+        super().__init__(('127.0.0.1', 0), SMTPHandler)
+        self.latency = latency
+        self.connect_latency = connect_latency
+        self.failures = failures
+        self.messages = []
+        self.lock = threading.Lock()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def accept(self, message):
+        with self.lock:
+            if self.failures > 0:
+                self.failures -= 1
+                return False
+            self.messages.append(message)
+            return True
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
+
+
+def use_smtp_server(port):
+    """Point Flask-Mail at a local plain-text SMTP server"""
+    app.config.update(MAIL_SERVER='127.0.0.1', MAIL_PORT=port, MAIL_USE_TLS=False, MAIL_USE_SSL=False,
+                      MAIL_USERNAME=None, MAIL_PASSWORD=None)
+    museum.mail.init_app(app)
+
+
+def wait_for(condition, timeout=30, interval=0.02):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise TimeoutError("condition not met before timeout")
+        time.sleep(interval)
+
+
+@benchmark('translate_warm')
+def bench_translate_warm():
+    """translate_batch on a page whose strings are all in the prefilled translations database"""
+    with tempfile.TemporaryDirectory() as workdir:
+        translator = prefilled_translator(workdir)
+        texts = sample_page_texts()
+
+        return {
+            'first_request': measure(lambda: translator.translate_batch(texts, 'fr', '/bench'), repeat=1, warmup=0),
+            'repeat_request': measure(lambda: translator.translate_batch(texts, 'fr', '/bench')),
+        }
+
+
+@benchmark('translate_cold')
+def bench_translate_cold():
+    """translate_batch on a page with no cached strings and repeated labels"""
+    with tempfile.TemporaryDirectory() as workdir:
+        translator = make_translator(workdir)
+        runs = itertools.count()
+
+        def run():
+            n = next(runs)
+            texts = [f"Run {n} label {i % 100}" for i in range(150)]
+            translator.translate_batch(texts, 'fr', f'/bench/{n}')
+
+        return measure(run)
+
+
+@benchmark('backend_parallel')
+def bench_backend_parallel():
+    """FastTranslator over 1000 strings with a simulated 20 ms backend round trip"""
+    backend = LocalDictionaryBackend(latency=0.02, max_batch_chars=2000)
+    fast_translator = FastTranslator(backend, max_workers=8)
+    texts = [f"Gallery caption {i} describing an artefact" for i in range(1000)]
+    return measure(lambda: fast_translator.translate_batch_parallel(texts, 'fr'), repeat=5, warmup=1)
+
+
+@benchmark('single_flight')
+def bench_single_flight():
+    """50 simultaneous cold requests for one page; each string must reach the backend once"""
+    class CountingBackend(LocalDictionaryBackend):
+        def __init__(self):
+            super().__init__(latency=0.05)
+            self.lock = threading.Lock()
+            self.sent = []
+
+        def translate_batch(self, texts, target_lang):
+            with self.lock:
+                self.sent.extend(texts)
+            return super().translate_batch(texts, target_lang)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        translator = make_translator(workdir)
+        backend = CountingBackend()
+        translator.fast_translator = FastTranslator(backend)
+        texts = sample_page_texts(100)
+        barrier = threading.Barrier(50)
+
+        def request():
+            barrier.wait()
+            translator.translate_texts(texts, 'fr')
+
+        threads = [threading.Thread(target=request) for _ in range(50)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = (time.perf_counter() - start) * 1000
+
+        return {'elapsed_ms': round(elapsed, 3), 'backend_strings': len(backend.sent), **translator.stats()['single_flight']}
+
+
+@benchmark('translate_stream')
+def bench_translate_stream():
+    """Half-cached page with a 200 ms backend: first streamed chunk vs the full blocking batch"""
+    with tempfile.TemporaryDirectory() as workdir:
+        translator = make_translator(workdir)
+        translator.fast_translator = FastTranslator(LocalDictionaryBackend(latency=0.2))
+        texts = sample_page_texts()
+        translator.translate_texts(texts[:75], 'fr')
+        runs = itertools.count()
+
+        def first_chunk():
+            n = next(runs)
+            page = texts[:75] + [f"Run {n} {text}" for text in texts[75:]]
+            stream = translator.stream_page(page, 'fr', f'/bench/{n}')
+            next(stream)
+            stream.close()
+
+        def full_batch():
+            n = next(runs)
+            page = texts[:75] + [f"Run {n} {text}" for text in texts[75:]]
+            translator.translate_batch(page, 'fr', f'/bench/{n}')
+
+        return {
+            'first_chunk': measure(first_chunk, repeat=5, warmup=1),
+            'full_batch': measure(full_batch, repeat=5, warmup=1),
+        }
+
+
+@benchmark('ticket_pdf')
+def bench_ticket_pdf():
+    """generate_ticket_pdf fast path vs the platypus layout, 4 visitors"""
+    booking = sample_booking()
+    results = {}
+    for name, render in (('canvas', generate_ticket_pdf), ('platypus', generate_ticket_pdf_platypus)):
+        stats = measure(lambda: render(booking), repeat=50, warmup=5)
+        stats['tickets_per_sec'] = round(1000 / stats['mean_ms'], 1)
+        results[name] = stats
+    return results
+
+
+@benchmark('ticket_pdf_cache')
+def bench_ticket_pdf_cache():
+    """Re-sent ticket served from the memory and disk tiers vs a fresh render"""
+    booking = sample_booking()
+    with tempfile.TemporaryDirectory() as workdir:
+        cache = TicketPDFCache(disk_dir=workdir)
+        first = cache.get(booking)
+
+        memory_hit = measure(lambda: cache.get(booking), repeat=200, warmup=5)
+
+        def disk_hit():
+            cache.entries.clear()
+            cache.total_bytes = 0
+            cache.get(booking)
+
+        disk = measure(disk_hit, repeat=200, warmup=5)
+        assert cache.get(dict(booking)).pdf == first.pdf, "cached ticket changed between requests"
+
+        return {
+            'render': measure(lambda: generate_ticket_pdf(booking), repeat=20, warmup=2),
+            'memory_hit': memory_hit,
+            'disk_hit': disk,
+            **cache.stats(),
+        }
+
+
+@benchmark('email_outbox')
+def bench_email_outbox():
+    """/send-ticket-email against a 300 ms SMTP server: inline send vs outbox enqueue, retries and dead-lettering"""
+    booking = sample_booking()
+    original_outbox = museum.email_outbox
+    with tempfile.TemporaryDirectory() as workdir, LocalSMTPServer(latency=0.3) as smtp:
+        use_smtp_server(smtp.port)
+        outbox = EmailOutbox(SQLiteConnectionPool(os.path.join(workdir, 'outbox.db')), museum.deliver_ticket_email,
+                             workers=4, max_attempts=3, backoff=0.05, poll_interval=0.05)
+        museum.email_outbox = outbox
+        client = app.test_client()
+        try:
+            def send_inline():
+                with app.app_context():
+                    assert museum.send_ticket_email(booking)
+
+            inline = measure(send_inline, repeat=3, warmup=0)
+
+            # Two refused deliveries are retried
+            smtp.failures = 2
+            bookings = iter([dict(booking, booking_id=f'MUS24{i:04d}') for i in range(20)])
+
+            def enqueue():
+                response = client.post('/send-ticket-email', json=next(bookings))
+                assert response.status_code == 202, response.status_code
+
+            queued = measure(enqueue, repeat=20, warmup=0)
+            statuses = lambda: [outbox.status(f'MUS24{i:04d}') for i in range(20)]
+            wait_for(lambda: all(status['status'] == 'sent' for status in statuses()))
+            attempts = sum(status['attempts'] for status in statuses())
+
+            # A booking the server keeps refusing ends up dead-lettered
+            smtp.failures = 10
+            client.post('/send-ticket-email', json=dict(booking, booking_id='MUS24DEAD'))
+            wait_for(lambda: outbox.status('MUS24DEAD')['status'] == 'dead')
+
+            return {'inline_send': inline, 'queued_request': queued, 'retried_attempts': attempts - 20,
+                    'outbox': outbox.stats()}
+        finally:
+            outbox.stop()
+            museum.email_outbox = original_outbox
+
+
+@benchmark('mail_campaign')
+def bench_mail_campaign():
+    """Reminder emails with a 30 ms handshake and 2 ms per message: one connection per email vs a pooled campaign"""
+    bookings = [dict(sample_booking(1), booking_id=f'MUS24{i:05d}') for i in range(2000)]
+    with LocalSMTPServer(latency=0.002, connect_latency=0.03) as smtp:
+        use_smtp_server(smtp.port)
+
+        with app.app_context():
+            start = time.perf_counter()
+            for booking_data in bookings[:100]:
+                send_reminder_email(booking_data)
+            per_email_rate = 100 / (time.perf_counter() - start)
+
+        smtp.failures = 3
+        campaign = MailCampaign(send_reminder_email, workers=4, rate=None, messages_per_connection=100)
+        report = campaign.run(bookings[i:i + 500] for i in range(0, len(bookings), 500))
+        assert report['sent'] + report['failed'] == len(bookings), report
+        assert report['failed'] == 3, report
+        assert len(smtp.messages) == 100 + report['sent']
+
+        return {
+            'per_email_connection': {'messages_per_second': round(per_email_rate, 1),
+                                     'minutes_for_10k': round(10000 / per_email_rate / 60, 1)},
+            'campaign': {key: report[key] for key in ('sent', 'failed', 'connections', 'elapsed_seconds',
+                                                      'messages_per_second')},
+            'campaign_minutes_for_10k': round(10000 / report['messages_per_second'] / 60, 1),
+        }
+
+
+@benchmark('group_tickets')
+def bench_group_tickets():
+    """60-visitor group as a merged PDF and as a ZIP asking for 1, 2, 4 ... cpu_count worker processes.
+
+    'processes' is how many group_ticket_workers actually used: never more than
+    the CPUs, so on a single-CPU host every run renders in-process.
+    """
+    booking = sample_booking(60)
+    generated_on = datetime.now()
+    results = {'cpu_count': os.cpu_count()}
+
+    # Share of the single-process time spent laying out pages, which is what the pool parallelizes
+    jobs = [job for _, job in group_jobs([booking], generated_on)]
+    pages = measure(lambda: _render_group_pages(jobs), repeat=5, warmup=1)['median_ms']
+    merged = measure(lambda: generate_group_tickets_pdf([booking], generated_on, workers=1), repeat=5, warmup=1)
+    results['parallel_fraction'] = round(pages / merged['median_ms'], 2)
+
+    renders = {
+        'pdf': lambda workers: generate_group_tickets_pdf([booking], generated_on, workers=workers),
+        'zip': lambda workers: b''.join(iter_group_tickets_zip([booking], generated_on, workers=workers)),
+    }
+    for name, render in renders.items():
+        results[name] = {}
+        for workers in sorted({1, 2, 4, os.cpu_count() or 1}):
+            stats = measure(lambda: render(workers), repeat=5, warmup=1)
+            stats['processes'] = group_ticket_workers(len(jobs), workers)
+            stats['speedup'] = round(results[name][1]['median_ms'] / stats['median_ms'], 2) if workers > 1 else 1.0
+            results[name][workers] = stats
+    return results
+
+
+@benchmark('translate_endpoint')
+def bench_translate_endpoint():
+    """POST /translate through the test client: cached bundle, 304 revalidation, and a page of new strings"""
+    original_translator = museum.pre_translator
+    with tempfile.TemporaryDirectory() as workdir:
+        museum.pre_translator = prefilled_translator(workdir)
+        client = app.test_client()
+        texts = sample_page_texts()
+        try:
+            response = client.post('/translate', json={'texts': texts, 'lang': 'fr', 'page_url': '/bench'})
+            assert response.status_code == 200, response.status_code
+            etag = response.headers['ETag']
+            runs = itertools.count()
+
+            def revalidate():
+                response = client.post('/translate', json={'texts': texts, 'lang': 'fr', 'page_url': '/bench'},
+                                       headers={'If-None-Match': etag})
+                assert response.status_code == 304, response.status_code
+
+            def new_page():
+                n = next(runs)
+                client.post('/translate', json={'texts': [f"Run {n} {text}" for text in texts], 'lang': 'fr',
+                                                'page_url': f'/bench/{n}'})
+
+            return {
+                'bundle': measure(lambda: client.post('/translate', json={'texts': texts, 'lang': 'fr',
+                                                                          'page_url': '/bench'})),
+                'not_modified': measure(revalidate),
+                'cold_page': measure(new_page, repeat=10),
+            }
+        finally:
+            museum.pre_translator = original_translator
+
+
+@benchmark('chatbot')
+def bench_chatbot():
+    """MuseumChatbot over CHATBOT_MESSAGES: get_response dicts vs ready-to-send respond() bodies"""
+    bot = MuseumChatbot()
+    messages = CHATBOT_MESSAGES * 50
+
+    def as_dict():
+        for n, message in enumerate(messages):
+            bot.get_response(message, user_id=n % 20)
+
+    def as_body():
+        for n, message in enumerate(messages):
+            bot.respond(message, user_id=n % 20).body
+
+    results = {}
+    for name, run in (('get_response', as_dict), ('respond_body', as_body)):
+        stats = measure(run, repeat=10)
+        stats['us_per_message'] = round(stats['median_ms'] * 1000 / len(messages), 2)
+        results[name] = stats
+    return results
+
+
+@benchmark('chatbot_localized')
+def bench_chatbot_localized():
+    """Bundle load from a warm cache, then replies in English vs French with translation calls counted"""
+    original_translator, original_bot = museum.pre_translator, museum.museum_chatbot
+    texts = catalog_texts()
+    with tempfile.TemporaryDirectory() as workdir:
+        translator = make_translator(workdir)
+        # The last few strings stay uncached to exercise the English fallback
+        translator.cache_translations([(text, f"[fr] {text}") for text in texts[:-5]], 'fr')
+        translator.memory_cache.clear()
+        calls = []
+        translate_texts = translator.translate_texts
+        translator.translate_texts = lambda *args, **kwargs: calls.append(args) or translate_texts(*args, **kwargs)
+        bot = MuseumChatbot()
+        museum.pre_translator, museum.museum_chatbot = translator, bot
+        try:
+            results = {'load_bundle': measure(lambda: museum.load_chatbot_bundles(['fr']), repeat=10)}
+            results['load_bundle']['localized_replies'] = len(bot.bundles['fr'])
+            messages = CHATBOT_MESSAGES * 50
+            for lang in ('en', 'fr'):
+                def run():
+                    for n, message in enumerate(messages):
+                        bot.respond(message, user_id=n % 20, lang=lang).body
+                stats = measure(run, repeat=10)
+                stats['us_per_message'] = round(stats['median_ms'] * 1000 / len(messages), 2)
+                results[f'respond_{lang}'] = stats
+            assert bot.respond('pricing', lang='fr').text.startswith('[fr] ')
+            results['translation_calls'] = len(calls)
+            return results
+        finally:
+            museum.pre_translator, museum.museum_chatbot = original_translator, original_bot
+
+
+@benchmark('chatbot_soak')
+def bench_chatbot_soak():
+    """200k anonymous users, 5000-entry store with a 4000-message idle TTL; traced memory must stay flat"""
+    clock = itertools.count()  # One tick per message
+    store = ConversationStore(max_entries=5000, ttl=4000, clock=lambda: next(clock))
+    bot = MuseumChatbot(store)
+    messages = CHATBOT_MESSAGES
+    checkpoints = {}
+
+    tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        for n in range(200000):
+            bot.respond(messages[n % len(messages)], f'guest:{n}', logged_in=False)
+            if n % 50000 == 49999:
+                checkpoints[n + 1] = {'entries': len(store), 'traced_kb': tracemalloc.get_traced_memory()[0] // 1024}
+        elapsed = time.perf_counter() - start
+    finally:
+        tracemalloc.stop()
+
+    memory = [checkpoint['traced_kb'] for checkpoint in checkpoints.values()]
+    assert max(memory) <= memory[0] * 1.1, checkpoints
+    assert all(checkpoint['entries'] <= store.max_entries for checkpoint in checkpoints.values()), checkpoints
+
+    # Through the route: every fresh test client is a new anonymous visitor
+    museum.museum_chatbot.user_state.entries.clear()
+    for n in range(500):
+        response = app.test_client().post('/chatbot', json={'message': messages[n % len(messages)]})
+        assert response.status_code == 200, response.status_code
+
+    return {
+        'messages_per_sec': round(200000 / elapsed),
+        'checkpoints': checkpoints,
+        'store': store.stats(),
+        'route_store': museum.museum_chatbot.user_state.stats(),
+    }
+
+
+def chatbot_intent_corpus(size=3000):
+    """CHATBOT_MESSAGES plus seeded messages mixing keywords of several intents in random order"""
+    rng = random.Random(SEED)
+    keywords = [
+        'hello', 'hi', 'hey', 'good morning', 'start', 'help', 'support', 'what can you do', 'book a ticket',
+        'reserve my ticket', 'buy ticket', 'want to book', 'booking', 'login', 'log in', 'sign in', 'have account',
+        'register', 'sign up', 'create account', 'new user', 'view ticket', 'my ticket', 'see ticket',
+        'check booking', 'cancel ticket', 'refund', 'delete ticket', 'price', 'cost', 'fee', 'rates', 'timing',
+        'hours', 'open', 'closing', 'schedule', 'location', 'address', 'where', 'contact', 'phone', 'services',
+        'facilities', 'amenities', 'policy', 'rules', 'terms', 'bye', 'goodbye', 'see you', 'thanks', 'thank you',
+        'exit', 'ticketing', 'history', 'this', 'shiny', 'bookshelf', 'opening', 'whereas', 'goodbyes', 'hit',
+    ]
+    filler = ['the', 'museum', 'please', 'can', 'i', 'tomorrow', 'for', 'kids', 'and', 'gallery', 'a', '?', '!']
+    corpus = [message.lower().strip() for message in CHATBOT_MESSAGES if not message.startswith('btn_')]
+    while len(corpus) < size:
+        words = rng.sample(keywords, rng.randrange(0, 4)) + rng.sample(filler, rng.randrange(0, 6))
+        rng.shuffle(words)
+        corpus.append(rng.choice([' ', ' ', '', '\n']).join(words))
+    return corpus
+
+
+@benchmark('chatbot_intents')
+def bench_chatbot_intents():
+    """Intent routing over a seeded corpus: precompiled matchers vs the old per-call patterns"""
+    bot = MuseumChatbot()
+    corpus = chatbot_intent_corpus()
+
+    # Routing as get_response did it before: rebuild the pattern -> handler dict, then search each one in turn
+    def legacy():
+        for message in corpus:
+            patterns = {pattern: getattr(bot, handler) for _, pattern, handler in MuseumChatbot.INTENTS}
+            for pattern, handler in patterns.items():
+                if re.search(pattern, message):
+                    break
+
+    def precompiled():
+        for message in corpus:
+            bot.match_intent(message)
+
+    results = {'messages': len(corpus), 'unmatched': sum(bot.match_intent(m) is None for m in corpus)}
+    for name, route in (('per_call_patterns', legacy), ('precompiled', precompiled)):
+        stats = measure(route, repeat=10)
+        stats['messages_per_sec'] = round(len(corpus) * 1000 / stats['median_ms'])
+        results[name] = stats
+    return results
+
+
+def misspell(word, rng):
+    """word with one dropped, doubled, swapped or replaced letter"""
+    i = rng.randrange(1, len(word) - 1)
+    edit = rng.choice(['drop', 'double', 'swap', 'replace'])
+    if edit == 'drop':
+        return word[:i] + word[i + 1:]
+    if edit == 'double':
+        return word[:i] + word[i] + word[i:]
+    if edit == 'swap':
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    return word[:i] + rng.choice('aeiou') + word[i + 1:]
+
+
+def misspelt_corpus(size=2000):
+    """Seeded (message, intent) pairs: one misspelt INTENT_KEYWORDS keyword among filler words"""
+    rng = random.Random(SEED)
+    keywords = [(keyword, intent) for intent, words in INTENT_KEYWORDS.items() for keyword in words]
+    filler = ['the', 'museum', 'please', 'can', 'i', 'tomorrow', 'for', 'kids', 'and', 'gallery', 'a', 'what']
+    corpus = []
+    while len(corpus) < size:
+        keyword, intent = rng.choice(keywords)
+        words = [misspell(word, rng) if len(word) >= 5 else word for word in keyword.split()]
+        if words == keyword.split():
+            continue
+        message = rng.sample(filler, rng.randrange(0, 3)) + [' '.join(words)] + rng.sample(filler, rng.randrange(0, 3))
+        corpus.append((' '.join(message), intent))
+    return corpus
+
+
+@benchmark('chatbot_fuzzy')
+def bench_chatbot_fuzzy():
+    """Fuzzy fallback on seeded typos: recall, per-message vs batched scoring, and POST /chatbot/batch"""
+    bot = MuseumChatbot()
+    corpus = [(message, intent) for message, intent in misspelt_corpus() if bot.match_intent(message) is None]
+    messages = [message for message, _ in corpus]
+    predicted = bot.classifier.classify(messages)
+    results = {
+        'messages': len(messages),
+        'recovered': round(sum(p == intent for p, (_, intent) in zip(predicted, corpus)) / len(corpus), 3),
+        'wrong_intent': round(sum(p not in (None, intent) for p, (_, intent) in zip(predicted, corpus)) / len(corpus), 3),
+        'off_topic_matched': sum(intent is not None for intent in bot.classifier.classify(
+            [message.lower() for message in CHATBOT_MESSAGES if bot.match_intent(message.lower()) is None])),
+    }
+
+    def one_at_a_time():
+        for message in messages:
+            bot.classifier.classify([message])
+
+    def batched(size):
+        for i in range(0, len(messages), size):
+            bot.classifier.classify(messages[i:i + size])
+
+    runs = [('single', one_at_a_time)] + [(f'batch_{size}', lambda size=size: batched(size)) for size in (100, 1000)]
+    for name, run in runs:
+        stats = measure(run, repeat=5)
+        stats['messages_per_sec'] = round(len(messages) * 1000 / stats['median_ms'])
+        results[name] = stats
+
+    client = app.test_client()
+    batch = messages[:app.config['CHATBOT_BATCH_MAX_MESSAGES']]
+
+    def post_batch():
+        response = client.post('/chatbot/batch', json={'messages': batch})
+        assert response.status_code == 200, response.status_code
+
+    stats = measure(post_batch, repeat=5)
+    stats['messages_per_sec'] = round(len(batch) * 1000 / stats['median_ms'])
+    results['endpoint_batch'] = stats
+    return results
+
+
+# Simulated chat clients for chat_stream, and messages each sends
+CHAT_CLIENTS = 200
+CHAT_MESSAGES_PER_CLIENT = 5
+
+
+class LocalAppServer:
+    """The app on a threaded werkzeug server on a free localhost port, for as long as the with block runs"""
+
+    def __enter__(self):
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)  # No access log line per request
+        self.server = make_server('127.0.0.1', 0, app, threaded=True)
+        self.port = self.server.server_port
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class ChatClient:
+    """One browser chat session: an SSE stream read on a thread, and messages posted on a keep-alive connection"""
+
+    def __init__(self, port):
+        self.port = port
+        self.cookie = None
+        self.events = queue.Queue()  # (event type, id, data) in arrival order
+        self.heartbeats = 0
+        self.last_event_id = None
+        self.stream = None
+        self.connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+
+    def headers(self, **extra):
+        headers = {'Content-Type': 'application/json', **extra}
+        if self.cookie:
+            headers['Cookie'] = self.cookie
+        return headers
+
+    def open_stream(self, resume=False):
+        self.stream = http.client.HTTPConnection('127.0.0.1', self.port, timeout=30)
+        headers = self.headers(**({'Last-Event-ID': self.last_event_id} if resume and self.last_event_id else {}))
+        self.stream.request('GET', '/chatbot/stream', headers=headers)
+        self.stream_socket = self.stream.sock  # getresponse() hands the socket to the response
+        response = self.stream.getresponse()
+        assert response.status == 200, response.status
+        if response.getheader('Set-Cookie'):
+            self.cookie = response.getheader('Set-Cookie').split(';', 1)[0]
+        threading.Thread(target=self.read_stream, args=(response,), daemon=True).start()
+
+    def read_stream(self, response):
+        event = {}
+        try:
+            for line in response:
+                line = line.decode().rstrip('\n')
+                if line.startswith(':'):
+                    self.heartbeats += 1
+                elif line:
+                    field, _, value = line.partition(': ')
+                    event[field] = value
+                elif 'data' in event:
+                    if 'id' in event:
+                        self.last_event_id = event['id']
+                    self.events.put((event.get('event', 'message'), event.get('id'), json.loads(event['data'])))
+                    event = {}
+        except (OSError, ValueError, http.client.HTTPException):
+            pass  # Stream closed
+
+    def close_stream(self):
+        self.stream_socket.shutdown(socket.SHUT_RDWR)
+        self.stream.close()
+
+    def post(self, path, body):
+        self.connection.request('POST', path, body=json.dumps(body), headers=self.headers())
+        response = self.connection.getresponse()
+        return response.status, json.loads(response.read())
+
+    def send(self, message):
+        """Post a message and wait for its reply on the stream; returns the reply"""
+        status, body = self.post('/chatbot/send', {'message': message})
+        assert status == 202, status
+        while True:
+            kind, event_id, data = self.events.get(timeout=30)
+            if event_id == body['id']:
+                return data
+
+
+@benchmark('chat_stream')
+def bench_chat_stream():
+    """CHAT_CLIENTS concurrent chats on a threaded server: SSE stream plus /chatbot/send vs a POST /chatbot per message.
+
+    Each streamed reply still costs a POST plus a wakeup on a stream thread, so
+    here the stream runs slower than a POST /chatbot per message.
+    """
+    rng = random.Random(SEED)
+    scripts = [[rng.choice(CHATBOT_MESSAGES) for _ in range(CHAT_MESSAGES_PER_CLIENT)] for _ in range(CHAT_CLIENTS)]
+    saved = {key: app.config[key] for key in ('CHATBOT_STREAM_HEARTBEAT', 'CHATBOT_STREAM_MAX_OPEN', 'TESTING')}
+    # Room for every client plus the resumed stream, whose predecessor closes on its next heartbeat
+    app.config.update(CHATBOT_STREAM_HEARTBEAT=0.5, CHATBOT_STREAM_MAX_OPEN=CHAT_CLIENTS * 2, TESTING=False)
+    results = {'clients': CHAT_CLIENTS, 'messages': CHAT_CLIENTS * CHAT_MESSAGES_PER_CLIENT}
+    try:
+        with LocalAppServer() as server:
+            def run(chat):
+                """Latencies in ms for each message of one client's script"""
+                client, script = chat
+                latencies = []
+                for message in script:
+                    start = time.perf_counter()
+                    chat_reply(client, message)
+                    latencies.append((time.perf_counter() - start) * 1000)
+                return latencies
+
+            for name, opened in (('request_per_message', False), ('stream', True)):
+                clients = [ChatClient(server.port) for _ in range(CHAT_CLIENTS)]
+                if opened:
+                    for client in clients:
+                        client.open_stream()
+                    chat_reply = lambda client, message: client.send(message)
+                else:
+                    chat_reply = lambda client, message: client.post('/chatbot', {'message': message})
+                start = time.perf_counter()
+                with concurrent.futures.ThreadPoolExecutor(max_workers=CHAT_CLIENTS) as executor:
+                    latencies = sorted(itertools.chain.from_iterable(executor.map(run, zip(clients, scripts))))
+                elapsed = time.perf_counter() - start
+                results[name] = {
+                    'messages_per_sec': round(len(latencies) / elapsed),
+                    'p50_ms': round(latencies[len(latencies) // 2], 2),
+                    'p95_ms': round(latencies[int(len(latencies) * 0.95)], 2),
+                }
+                if opened:
+                    time.sleep(1.2)
+                    results[name]['heartbeats'] = sum(client.heartbeats for client in clients)
+
+                    # Disconnect one client, overflow its buffer, and resume from its last event id
+                    client = clients[0]
+                    client.close_stream()
+                    buffered = app.config['CHATBOT_STREAM_BUFFER']
+                    ids = [client.post('/chatbot/send', {'message': 'pricing'})[1]['id'] for _ in range(buffered + 6)]
+                    client.events = queue.Queue()
+                    client.open_stream(resume=True)
+                    kind, _, data = client.events.get(timeout=10)
+                    replayed = [client.events.get(timeout=10)[1] for _ in range(buffered)]
+                    assert kind == 'reset' and data == {'missed': 6}, (kind, data)
+                    assert replayed == ids[6:], 'resume did not replay the buffered replies in order'
+                    results[name]['resume'] = {'missed': data['missed'], 'replayed': len(replayed)}
+                for client in clients:
+                    if client.stream:
+                        client.close_stream()
+                    client.connection.close()
+            results['channels'] = museum.chat_channels.stats()
+    finally:
+        app.config.update(saved)
+    return results
+
+
+@benchmark('my_tickets')
+def bench_my_tickets():
+    """GET /my_tickets for 10, 1k and 10k tickets, and keyset pages of /my_tickets/page for the 10k user"""
+    users = seed_database()
+    testing = app.config['TESTING']
+    app.config['TESTING'] = True
+    try:
+        return my_tickets_results(users)
+    finally:
+        # TESTING also suppresses Flask-Mail, which later benchmarks need
+        app.config['TESTING'] = testing
+
+
+def my_tickets_results(users):
+    results = {}
+    for size, user_id in sorted(users.items()):
+        client = logged_in_client(user_id)
+
+        def render():
+            response = client.get('/my_tickets')
+            assert response.status_code == 200, response.status_code
+
+        results[size] = measure(render, repeat=5 if size >= 10000 else 20, warmup=1)
+
+    size = max(users)
+    client = logged_in_client(users[size])
+
+    def page(cursor=None, limit=None):
+        response = client.get('/my_tickets/page', query_string={'cursor': cursor or '', 'limit': limit or ''})
+        assert response.status_code == 200, response.status_code
+        return response.get_json()
+
+    # Walk every page and check the list is complete and ordered newest first
+    cursor, seen, cursors = None, [], []
+    while True:
+        body = page(cursor, limit=app.config['MY_TICKETS_MAX_PAGE_SIZE'])
+        seen.extend(body['tickets'])
+        cursor = body['next_cursor']
+        if not cursor:
+            break
+        cursors.append(cursor)
+    with app.app_context():
+        expected = [ticket.id for ticket in sorted(Ticket.query.filter_by(user_id=users[size]),
+                                                   key=lambda ticket: (ticket.created_at, ticket.id), reverse=True)]
+    assert [ticket['id'] for ticket in seen] == expected, 'keyset pages skipped, repeated or reordered tickets'
+
+    def full_list():
+        # The list as my_tickets built it before paging: every Ticket object, formatted in Python
+        with app.test_request_context():
+            [{'booking_id': museum.ticket_booking_id(ticket), 'amount': museum.ticket_amount(ticket)}
+             for ticket in Ticket.query.filter_by(user_id=users[size]).all()]
+
+    results[f'{size}_pages'] = {
+        'first_page': measure(page, repeat=20, warmup=1),
+        'last_page': measure(lambda: page(cursors[-1]), repeat=20, warmup=1),
+        'walk_all': measure(lambda: [page(cursor, 100) for cursor in [None] + cursors], repeat=3, warmup=0),
+        'full_list_query': measure(full_list, repeat=5, warmup=1),
+    }
+    return results
+
+
+# The ticket table as models.py used to create it: no created_at, no indexes
+LEGACY_SCHEMA = """
+CREATE TABLE user (
+    id INTEGER PRIMARY KEY, username VARCHAR(80) NOT NULL UNIQUE, password VARCHAR(120) NOT NULL
+);
+CREATE TABLE ticket (
+    id INTEGER PRIMARY KEY, name VARCHAR(100) NOT NULL, age INTEGER NOT NULL, email VARCHAR(120) NOT NULL,
+    user_id INTEGER NOT NULL REFERENCES user (id)
+);
+"""
+
+
+@benchmark('schema')
+def bench_schema():
+    """upgrade_schema on a legacy database, hot query plans, and a small user's ticket page with and without its index"""
+    path = os.path.join(FIXTURE_DIR, 'legacy.db')
+    if os.path.exists(path):
+        os.remove(path)
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.begin() as connection:
+        for statement in LEGACY_SCHEMA.split(';')[:-1]:
+            connection.exec_driver_sql(statement)
+        connection.exec_driver_sql("INSERT INTO user (id, username, password) VALUES (1, 'legacy', 'legacy')")
+        connection.exec_driver_sql('INSERT INTO ticket (name, age, email, user_id) VALUES ' + ', '.join(
+            f"('Visitor {n}', {20 + n % 50}, 'visitor{n}@example.com', 1)" for n in range(10000)))
+
+    start = time.perf_counter()
+    with engine.begin() as connection:
+        changes = upgrade_schema(connection)
+    upgrade_ms = round((time.perf_counter() - start) * 1000, 2)
+    engine.dispose()
+
+    users = seed_database()
+    with app.app_context():
+        with db.engine.begin() as connection:
+            plans = museum.check_query_plans(connection)
+
+        # The 10-ticket user's rows are spread among everyone else's: without the
+        # per-user index the page has to walk the whole table to find them
+        first_page = lambda: museum.ticket_page_query(users[min(users)], limit=21).all()
+        index = next(index for index in Ticket.__table__.indexes if index.name == 'ix_ticket_user_id_created_at')
+        pages = {'indexed': measure(first_page, repeat=20)}
+        index.drop(db.engine)
+        try:
+            pages['no_index'] = measure(first_page, repeat=20)
+        finally:
+            index.create(db.engine)
+
+    return {
+        'legacy_upgrade': {'tickets': 10000, 'ms': upgrade_ms, 'changes': changes},
+        'plans': {name: plan['indexes'] for name, (plan, _) in plans.items()},
+        'small_user_page': pages,
+    }
+
+
+GROUP_BOOKING_SIZES = (1, 10, 100)
+
+
+def group_visitors(size):
+    return [{'name': f'Visitor {i}', 'age': 8 if i % 3 == 1 else 35} for i in range(size)]
+
+
+def group_booking_inserts(engine, user_id):
+    """Per-visitor INSERT and commit (as /book_ticket stores them) vs insert_group_booking, per group size"""
+    results = {}
+    for size in GROUP_BOOKING_SIZES:
+        booking = {'contact_email': 'group@example.com', 'contact_phone': '+91 98765 43210',
+                   'visit_date': date(2026, 3, 12), 'visitors': group_visitors(size)}
+
+        def per_visitor():
+            for visitor in booking['visitors']:
+                with engine.begin() as connection:
+                    connection.execute(insert(Ticket), dict(visitor, email=booking['contact_email'], user_id=user_id,
+                                                            created_at=utc_now()))
+
+        def group():
+            with engine.begin() as connection:
+                museum.insert_group_booking(connection, user_id, booking)
+
+        repeat = 20 if size < 100 else 5
+        results[size] = {'per_visitor_commits': measure(per_visitor, repeat=repeat),
+                         'one_transaction': measure(group, repeat=repeat)}
+    return results
+
+
+@benchmark('group_booking')
+def bench_group_booking():
+    """1, 10 and 100-visitor bookings: a /book_ticket POST per visitor vs one /bookings POST, and the inserts alone"""
+    users = seed_database()
+    user_id = users[min(users)]
+    client = logged_in_client(user_id)
+    results = {'endpoint': {}}
+    for size in GROUP_BOOKING_SIZES:
+        visitors = group_visitors(size)
+
+        def book_each():
+            for visitor in visitors:
+                response = client.post('/book_ticket', data=dict(visitor, age=35, email='group@example.com'))
+                assert response.status_code == 302, response.status_code
+
+        def book_group():
+            response = client.post('/bookings', json={'visitors': visitors, 'contact_email': 'group@example.com'})
+            assert response.status_code == 201, response.get_json()
+
+        repeat = 20 if size < 100 else 5
+        results['endpoint'][size] = {'book_ticket_posts': measure(book_each, repeat=repeat),
+                                     'bookings_post': measure(book_group, repeat=repeat)}
+
+    with app.app_context():
+        results['sqlite'] = group_booking_inserts(db.engine, user_id)
+
+    postgres_url = os.environ.get('BENCH_POSTGRES_URL')
+    if not postgres_url:
+        results['postgresql'] = 'skipped: set BENCH_POSTGRES_URL'
+        return results
+    engine = create_engine(postgres_url)
+    with engine.begin() as connection:
+        upgrade_schema(connection)
+        pg_user_id = connection.execute(insert(User).returning(User.id), {
+            'username': f'bench_group_{time.time_ns()}', 'password': 'bench'}).scalar_one()
+    try:
+        results['postgresql'] = group_booking_inserts(engine, pg_user_id)
+    finally:
+        with engine.begin() as connection:
+            connection.execute(delete(Ticket).where(Ticket.user_id == pg_user_id))
+            connection.execute(delete(Booking).where(Booking.user_id == pg_user_id))
+            connection.execute(delete(User).where(User.id == pg_user_id))
+        engine.dispose()
+    return results
+
+
+def flatten_medians(results, prefix=''):
+    """{'bench.path.median_ms': value} for every median in a result tree"""
+    medians = {}
+    for key, value in results.items():
+        path = f"{prefix}.{key}" if prefix else str(key)
+        if isinstance(value, dict):
+            medians.update(flatten_medians(value, path))
+        elif key == 'median_ms':
+            medians[path] = value
+    return medians
+
+
+def compare_to_baseline(results, baseline, threshold, min_delta_ms):
+    """Print each median against the baseline; returns the regressed paths"""
+    current = flatten_medians(results)
+    previous = flatten_medians(baseline['results'])
+    regressions = []
+    print(f"\n{'benchmark':<52}{'baseline':>11}{'current':>11}{'change':>9}")
+    for path in sorted(current):
+        if path not in previous:
+            continue
+        before, after = previous[path], current[path]
+        change = (after - before) / before if before else 0
+        regressed = change > threshold and after - before > min_delta_ms
+        if regressed:
+            regressions.append(path)
+        print(f"{path:<52}{before:>11.3f}{after:>11.3f}{change:>+9.0%}{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def main(argv):
+    global SEED
+    parser = argparse.ArgumentParser(description='Benchmark the MuseumHub hot paths.')
+    parser.add_argument('names', nargs='*', help=f"Benchmarks to run (default: all): {', '.join(BENCHMARKS)}")
+    parser.add_argument('--json', dest='json_path', help='Write results to this JSON file')
+    parser.add_argument('--baseline', help='JSON results of an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Allowed slowdown of a median before it counts as a regression (default: 0.2 = 20%%)')
+    parser.add_argument('--min-delta-ms', type=float, default=0.05,
+                        help='Ignore slowdowns smaller than this many milliseconds (default: 0.05)')
+    parser.add_argument('--seed', type=int, default=SEED, help=f'Fixture seed (default: {SEED})')
+    args = parser.parse_args(argv)
+    SEED = args.seed
+    random.seed(SEED)
+
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"Unknown benchmark: {', '.join(unknown)}")
+
+    results = {}
+    for name in args.names or list(BENCHMARKS):
+        results[name] = BENCHMARKS[name]()
+        print(f"{name}: {results[name]}")
+
+    if args.json_path:
+        output = {
+            'meta': {
+                'timestamp': datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'cpu_count': os.cpu_count(),
+                'seed': SEED,
+            },
+            'results': results,
+        }
+        with open(args.json_path, 'w') as f:
+            json.dump(output, f, indent=2, default=str)
+        print(f"Wrote {args.json_path}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(json.loads(json.dumps(results, default=str)), baseline,
+                                          args.threshold, args.min_delta_ms)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}")
+            return 1
+        print("\nNo regressions")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -1,316 +1,708 @@
 import re
 import random
+import json
+import threading
+import functools
+import secrets
+import time
+from collections import namedtuple, OrderedDict, deque
+
+import numpy as np
+
+
+class ChatResponse(namedtuple('ChatResponse', 'text buttons action body')):
+    """An immutable chatbot reply and its JSON encoding, built once.
+
+    buttons is a tuple of (id, text) pairs. body is the UTF-8 JSON of to_dict(),
+    the {'text', 'buttons', 'action'} shape chatbot.html renders.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def build(cls, text, buttons=(), action=None):
+        buttons = tuple(buttons)
+        response = cls(text, buttons, action, b'')
+        return response._replace(body=json.dumps(response.to_dict(), ensure_ascii=False).encode('utf-8'))
+
+    def to_dict(self):
+        """A fresh dict in the shape get_response has always returned"""
+        data = {'text': self.text, 'buttons': [{'id': button_id, 'text': text} for button_id, text in self.buttons]}
+        if self.action is not None:
+            data['action'] = self.action
+        return data
+
+    def localized(self, translations):
+        """This reply with its text and button labels looked up in {english: translated}.
+
+        Anything missing from translations stays in English.
+        """
+        return self.build(
+            translations.get(self.text, self.text),
+            [(button_id, translations.get(text, text)) for button_id, text in self.buttons],
+            self.action
+        )
+
+
+MAIN_MENU_BUTTON = ('btn_main_menu', '🏠 Main Menu')
+
+# Replies to the chat buttons
+BUTTON_RESPONSES = {
+    'btn_login': ChatResponse.build(
+        "Great! Please click the login button below to access your account.",
+        action='redirect_login'
+    ),
+    'btn_register': ChatResponse.build(
+        "Welcome to MuseumHub! Please click the register button below to create your account.",
+        action='redirect_register'
+    ),
+    'btn_book_tickets': ChatResponse.build(
+        "Excellent! Let me guide you to our ticket booking page where you can select your preferred date and tickets.",
+        action='redirect_booking'
+    ),
+    'btn_view_tickets': ChatResponse.build(
+        "Here are your booked tickets. You can view, download, or print them.",
+        action='redirect_my_tickets'
+    ),
+    'btn_cancel_ticket': ChatResponse.build(
+        "I can help you cancel your ticket. Please note that cancellation is allowed within 48 hours of booking.",
+        [('btn_view_tickets', 'View My Tickets'), ('btn_main_menu', 'Main Menu')]
+    ),
+    'btn_pricing_info': ChatResponse.build(
+        "Here's our pricing information:\n• Adult (18+): ₹150\n• Child (5-17): ₹80\n• Senior (60+): ₹100\n• Student (with ID): ₹60\n• Infant (below 5): Free",
+        [('btn_book_tickets', 'Book Tickets'), ('btn_main_menu', 'Main Menu')]
+    ),
+    'btn_museum_info': ChatResponse.build(
+        "Museum Information:\n• Hours: 9:00 AM - 6:00 PM (Daily)\n• Location: Culture Street, Art District\n• Contact: +91 98765 43210\n• Facilities: Audio Guide, VR Experience, Photography allowed",
+        [('btn_book_tickets', 'Book Tickets'), ('btn_main_menu', 'Main Menu')]
+    ),
+    'btn_main_menu': ChatResponse.build(
+        "What would you like to do?",
+        [('btn_book_tickets', '🎫 Book Tickets'), ('btn_view_tickets', '📋 My Tickets'),
+         ('btn_pricing_info', '💰 Pricing'), ('btn_museum_info', '🏛️ Museum Info')]
+    ),
+}
+
+GREETINGS = [
+    "Hello! Welcome to MuseumHub 🏛️",
+    "Hi there! Welcome to our museum booking assistant!",
+    "Hey! Great to see you at MuseumHub!"
+]
+
+FAREWELL_MESSAGES = [
+    "Thank you for visiting MuseumHub! Have a wonderful day! 🏛️",
+    "Goodbye! We hope to see you at the museum soon! 👋",
+    "Thanks for chatting with me! Enjoy your museum experience! ✨"
+]
+
+# Replies to typed messages. Keys with a ':member' / ':guest' suffix depend on
+# whether the user is logged in; tuples are variants picked at random.
+RESPONSES = {
+    'greeting:member': tuple(ChatResponse.build(
+        f"{greeting}\n\nWelcome back! What would you like to do today?",
+        [('btn_book_tickets', '🎫 Book New Tickets'), ('btn_view_tickets', '📋 My Tickets'),
+         ('btn_museum_info', '🏛️ Museum Info'), ('btn_pricing_info', '💰 Pricing')]
+    ) for greeting in GREETINGS),
+    'greeting:guest': tuple(ChatResponse.build(
+        f"{greeting}\n\nTo get started, please choose an option:",
+        [('btn_login', '🔐 Login'), ('btn_register', '✨ Register'),
+         ('btn_museum_info', '🏛️ Museum Info'), ('btn_pricing_info', '💰 View Pricing')]
+    ) for greeting in GREETINGS),
+    'help': ChatResponse.build(
+        "I'm here to help you with your museum visit! I can assist you with:\n\n• Ticket booking and management\n• Pricing information\n• Museum details and timings\n• Policies and guidelines\n\nWhat would you like to know more about?",
+        [('btn_book_tickets', '🎫 Book Tickets'), ('btn_pricing_info', '💰 Pricing'),
+         ('btn_museum_info', '🏛️ Museum Info'), ('btn_view_tickets', '📋 My Tickets')]
+    ),
+    'booking:member': ChatResponse.build(
+        "Perfect! I'd love to help you book tickets. Our booking system allows you to:\n\n• Choose your visit date\n• Select ticket types and quantities\n• Add optional services (Audio guide, VR experience)\n• Make secure payment\n\nReady to start booking?",
+        [('btn_book_tickets', '🎫 Start Booking'), ('btn_pricing_info', '💰 View Pricing First')]
+    ),
+    'booking:guest': ChatResponse.build(
+        "I'd be happy to help you book tickets! However, you'll need to login or create an account first to proceed with booking.\n\nWould you like to:",
+        [('btn_login', '🔐 Login to Existing Account'), ('btn_register', '✨ Create New Account'),
+         ('btn_pricing_info', '💰 View Pricing First')]
+    ),
+    'login': ChatResponse.build(
+        "Great! If you already have an account, please click below to login:",
+        [('btn_login', '🔐 Login Now'), ('btn_register', '✨ Create Account Instead')]
+    ),
+    'register': ChatResponse.build(
+        "Welcome to MuseumHub! Creating an account is quick and easy. You'll be able to:\n\n• Book tickets online\n• Manage your bookings\n• View booking history\n• Get exclusive offers\n\nReady to join us?",
+        [('btn_register', '✨ Create Account'), ('btn_login', '🔐 Login to Existing Account')]
+    ),
+    'view_tickets:member': ChatResponse.build(
+        "Let me show you your tickets. You can view, download, print, or manage your bookings.",
+        [('btn_view_tickets', '📋 View My Tickets'), ('btn_book_tickets', '🎫 Book More Tickets')]
+    ),
+    'view_tickets:guest': ChatResponse.build(
+        "To view your tickets, please login to your account first:",
+        [('btn_login', '🔐 Login'), ('btn_register', '✨ Create Account')]
+    ),
+    'cancel': ChatResponse.build(
+        "I can help you with ticket cancellation. Please note our cancellation policy:\n\n• Cancellation allowed within 48 hours of booking\n• No refund if you miss your scheduled visit\n• Processing may take 3-5 business days\n\nWould you like to view your tickets to proceed with cancellation?",
+        [('btn_view_tickets', '📋 View My Tickets'), MAIN_MENU_BUTTON]
+    ),
+    'pricing': ChatResponse.build(
+        "Here's our current pricing:\n\n🎫 **Ticket Prices:**\n• Adult (18+): ₹150\n• Child (5-17): ₹80\n• Senior Citizen (60+): ₹100\n• Student (with ID): ₹60\n• Infant (below 5): Free\n\n🎯 **Add-on Services:**\n• Audio Guide: ₹50/device\n• VR Experience: ₹100/person\n• Photography Pass: ₹200/group\n• Guided Tour: ₹300/group",
+        [('btn_book_tickets', '🎫 Book Now'), MAIN_MENU_BUTTON]
+    ),
+    'timings': ChatResponse.build(
+        "🕒 Museum Timings:\n• Open: 9:00 AM\n• Close: 5:00 PM\n• Last Entry: 4:30 PM\n\nLet me know if you'd like to book tickets!",
+        [('btn_book_tickets', '🎫 Book Tickets'), MAIN_MENU_BUTTON]
+    ),
+    'contact': ChatResponse.build(
+        "📍 **Museum Location & Contact:**\n\n🏛️ MuseumHub\n123 Culture Street, Art District\nCity, State - 123456\n\n📞 Phone: +91 98765 43210\n📧 Email: info@museumhub.com\n🌐 Website: www.museumhub.com",
+        [('btn_book_tickets', '🎫 Book Tickets'), MAIN_MENU_BUTTON]
+    ),
+    'services': ChatResponse.build(
+        "🏛️ **Our Services:**\n\n✅ **Available Services:**\n• Online ticket booking\n• Audio guides in multiple languages\n• VR experiences\n• Guided tours\n• Photography permissions\n• Wheelchair accessibility\n• Gift shop\n• Cafeteria\n\n🎯 **Digital Services:**\n• Mobile tickets\n• Online cancellation\n• Booking history\n• Email notifications",
+        [('btn_book_tickets', '🎫 Book Tickets'), ('btn_pricing_info', '💰 View Pricing'), MAIN_MENU_BUTTON]
+    ),
+    'policies': ChatResponse.build(
+        "📋 **Museum Policies:**\n\n🔸 **Booking Rules:**\n• Minimum age for booking: 18 years\n• One booking per person at a time\n• Valid ID required at entry\n\n🔸 **Cancellation Policy:**\n• Cancel within 48 hours of booking\n• No refund for missed visits\n• Processing time: 3-5 business days\n\n🔸 **Visit Guidelines:**\n• Arrive 15 minutes before your slot\n• No outside food or drinks\n• Photography rules apply\n• Follow museum etiquette",
+        [('btn_book_tickets', '🎫 Book Tickets'), MAIN_MENU_BUTTON]
+    ),
+    'goodbye': tuple(ChatResponse.build(
+        farewell,
+        [('btn_main_menu', '🏠 Start Over'), ('btn_book_tickets', '🎫 Quick Book')]
+    ) for farewell in FAREWELL_MESSAGES),
+    'default': ChatResponse.build(
+        "I'm not quite sure about that, but I'm here to help! I can assist you with:\n\n• Booking museum tickets\n• Viewing your tickets\n• Pricing information\n• Museum details and policies\n\nWhat would you like to know more about?",
+        [('btn_book_tickets', '🎫 Book Tickets'), ('btn_view_tickets', '📋 My Tickets'),
+         ('btn_museum_info', '🏛️ Museum Info'), ('btn_pricing_info', '💰 Pricing')]
+    ),
+}
+
+
+def all_responses():
+    """Every reply in the catalog, button replies first"""
+    yield from BUTTON_RESPONSES.values()
+    for response in RESPONSES.values():
+        if isinstance(response, ChatResponse):
+            yield response
+        else:
+            yield from response
+
+
+def catalog_texts():
+    """Distinct reply texts and button labels, in catalog order, for pre-translation"""
+    texts = {}
+    for response in all_responses():
+        texts.setdefault(response.text)
+        for _, text in response.buttons:
+            texts.setdefault(text)
+    return list(texts)
+
+
+class ConversationStore:
+    """Per-user conversation state, bounded by entry count and idle time.
+
+    Entries are kept in last-use order, so the least recently used entry is
+    evicted when the store is full and idle entries expire from the front.
+    All access goes through one lock.
+    """
+
+    def __init__(self, max_entries=10000, ttl=1800, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self.entries = OrderedDict()  # key -> (last used, state dict)
+        self.lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        """A copy of key's state, or None"""
+        with self.lock:
+            self._expire()
+            entry = self.entries.get(key)
+            return dict(entry[1]) if entry else None
+
+    def update(self, key, defaults, apply):
+        """Call apply(state) on key's state, created from defaults if absent, under the store lock"""
+        with self.lock:
+            now = self.clock()
+            self._expire(now)
+            entry = self.entries.pop(key, None)
+            state = entry[1] if entry else dict(defaults)
+            apply(state)
+            self.entries[key] = (now, state)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def discard(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'max_entries': self.max_entries,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+    def _expire(self, now=None):
+        """Drop idle entries; caller holds self.lock"""
+        if self.ttl is None:
+            return
+        cutoff = (self.clock() if now is None else now) - self.ttl
+        while self.entries:
+            key, (last_used, _) = next(iter(self.entries.items()))
+            if last_used > cutoff:
+                return
+            del self.entries[key]
+            self.expirations += 1
+
+
+class ChatChannel:
+    """One chat session's outgoing events, numbered so a stream can resume.
+
+    Event ids are "<token>-<number>"; the token changes with every channel, so
+    an id from an evicted or restarted channel replays the buffer from the
+    start. The newest max_events events stay buffered and reading never
+    removes them: a slow or reconnecting stream gets whatever is still
+    buffered after its cursor and learns how many it missed.
+    """
+
+    def __init__(self, max_events=64):
+        self.token = secrets.token_hex(4)
+        self.events = deque(maxlen=max_events)  # (number, data)
+        self.published = 0
+        self.closed = False
+        self.condition = threading.Condition()
+
+    def publish(self, data):
+        """Buffer data (bytes without newlines) and wake waiting streams; returns its event id"""
+        with self.condition:
+            self.published += 1
+            self.events.append((self.published, data))
+            self.condition.notify_all()
+            return f"{self.token}-{self.published}"
+
+    def cursor(self, event_id):
+        """Event number to resume after for a Last-Event-ID, 0 for the whole buffer"""
+        token, _, number = (event_id or '').partition('-')
+        if token != self.token or not number.isdigit():
+            return 0
+        return min(int(number), self.published)
+
+    def wait(self, after, timeout):
+        """(events numbered after `after`, how many of those are no longer buffered).
+
+        Blocks up to timeout seconds while there is nothing new.
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: self.published > after or self.closed, timeout)
+            oldest = self.events[0][0] if self.events else self.published + 1
+            return [event for event in self.events if event[0] > after], max(0, oldest - after - 1)
+
+    def close(self):
+        """End every stream reading this channel"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+
+class ChatChannels:
+    """ChatChannel per chat session, bounded by count and idle time like ConversationStore.
+
+    Channels that are evicted or expire are closed, which ends their streams;
+    the client reconnects and gets a fresh channel.
+    """
+
+    def __init__(self, max_channels=10000, ttl=1800, max_events=64, clock=time.monotonic):
+        self.max_channels = max_channels
+        self.ttl = ttl
+        self.max_events = max_events
+        self.clock = clock
+        self.channels = OrderedDict()  # key -> (last used, channel)
+        self.lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        """key's channel, created if absent, marked as just used"""
+        with self.lock:
+            now = self.clock()
+            self._expire(now)
+            entry = self.channels.pop(key, None)
+            channel = entry[1] if entry else ChatChannel(self.max_events)
+            self.channels[key] = (now, channel)
+            while len(self.channels) > self.max_channels:
+                _, (_, evicted) = self.channels.popitem(last=False)
+                evicted.close()
+                self.evictions += 1
+            return channel
+
+    def __len__(self):
+        return len(self.channels)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'channels': len(self.channels),
+                'max_channels': self.max_channels,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+    def _expire(self, now):
+        """Close and drop idle channels; caller holds self.lock"""
+        if self.ttl is None:
+            return
+        cutoff = now - self.ttl
+        while self.channels:
+            key, (last_used, channel) = next(iter(self.channels.items()))
+            if last_used > cutoff:
+                return
+            del self.channels[key]
+            channel.close()
+            self.expirations += 1
+
+
+# Keywords per intent for the fuzzy fallback, in MuseumChatbot.INTENTS priority
+# order. Mostly the literal alternatives of its patterns, minus very short words
+# and phrases whose near misses are ordinary chat ("fee" ~ "feel", "see you" ~
+# "are you", "cost" ~ "lost").
+INTENT_KEYWORDS = {
+    'greeting': ['hello', 'good morning', 'good evening', 'start'],
+    'help': ['help', 'support', 'assist'],
+    'booking': ['book ticket', 'book tickets', 'reserve ticket', 'buy ticket', 'buy tickets', 'want to book', 'booking'],
+    'login': ['login', 'log in', 'sign in', 'already registered', 'have account'],
+    'register': ['register', 'sign up', 'create account', 'new user', 'new account'],
+    'view_tickets': ['view ticket', 'view tickets', 'my ticket', 'my tickets', 'see ticket', 'check booking'],
+    'cancel': ['cancel ticket', 'cancel', 'refund', 'delete ticket'],
+    'pricing': ['price', 'prices', 'pricing', 'how much', 'rates', 'charges'],
+    'timings': ['timing', 'timings', 'time', 'hours', 'open', 'closing', 'schedule'],
+    'contact': ['location', 'address', 'where', 'contact', 'phone'],
+    'services': ['services', 'facilities', 'amenities', 'features'],
+    'policies': ['policy', 'policies', 'rules', 'guidelines', 'terms'],
+    'goodbye': ['bye', 'goodbye', 'thanks', 'exit'],
+}
+
+
+class IntentClassifier:
+    """Fuzzy intent matching for misspelt messages ("tickts", "prise").
+
+    Keywords and message windows are character n-gram TF-IDF vectors. Every
+    run of 1 to N words in a message is compared with the keywords of the
+    same word count and about the same length (length_tolerance of the
+    keyword's length, at least one character). The best cosine similarity of
+    at least min_score picks the intent; ties go to the earlier keyword. The
+    keyword matrix is built once and a whole batch is scored with one matrix
+    product.
+    """
+
+    WORD = re.compile(r"[a-z0-9']+")
+
+    def __init__(self, keywords, ngram_range=(1, 2), min_score=0.7, min_word_length=3, length_tolerance=0.25,
+                 word_cache_size=10000):
+        self.ngram_range = ngram_range
+        self.min_score = min_score
+        self.min_word_length = min_word_length
+        pairs = [(intent, keyword) for intent, words in keywords.items() for keyword in words]
+        self.intents = [intent for intent, _ in pairs]
+        self.keyword_words = np.array([len(keyword.split()) for _, keyword in pairs])
+        self.max_words = int(self.keyword_words.max())
+        self.keyword_lengths = np.array([len(keyword) for _, keyword in pairs])
+        self.length_slack = np.maximum(1, (self.keyword_lengths * length_tolerance).astype(int))
+        
+        grams = [self.ngrams(keyword) for _, keyword in pairs]
+        self.vocabulary = {}
+        for keyword_grams in grams:
+            for gram in keyword_grams:
+                self.vocabulary.setdefault(gram, len(self.vocabulary))
+        # Each intent is one document, so n-grams its own keywords share keep their weight
+        intent_grams = {}
+        for intent, keyword_grams in zip(self.intents, grams):
+            intent_grams.setdefault(intent, set()).update(keyword_grams)
+        document_frequency = np.zeros(len(self.vocabulary))
+        for intent_gram_set in intent_grams.values():
+            document_frequency[[self.vocabulary[gram] for gram in intent_gram_set]] += 1
+        self.idf = (np.log((1 + len(intent_grams)) / (1 + document_frequency)) + 1).astype(np.float32)
+        self.unseen_idf = np.log(1 + len(intent_grams)) + 1
+        
+        # (vocabulary, keywords): column k is keyword k's unit-length TF-IDF vector
+        matrix = np.zeros((len(pairs), len(self.vocabulary)), dtype=np.float32)
+        for row, keyword_grams in enumerate(grams):
+            for gram in keyword_grams:
+                matrix[row, self.vocabulary[gram]] += self.idf[self.vocabulary[gram]]
+        self.matrix = np.ascontiguousarray((matrix / np.linalg.norm(matrix, axis=1, keepdims=True)).T)
+        
+        self.word_grams = functools.lru_cache(maxsize=word_cache_size)(self._word_grams)
+    
+    def ngrams(self, text):
+        """Character n-grams of each word, padded with spaces so word edges count"""
+        grams = []
+        low, high = self.ngram_range
+        for word in text.split():
+            word = f" {word} "
+            for n in range(low, high + 1):
+                grams.extend(word[i:i + n] for i in range(len(word) - n + 1))
+        return grams
+    
+    def _word_grams(self, word):
+        """(vocabulary ids, counts, squared TF-IDF weight of n-grams outside the vocabulary) for one word"""
+        counts = {}
+        for gram in self.ngrams(word):
+            counts[gram] = counts.get(gram, 0) + 1
+        known = [(self.vocabulary[gram], count) for gram, count in counts.items() if gram in self.vocabulary]
+        unseen = sum(count * count for gram, count in counts.items() if gram not in self.vocabulary)
+        return (np.array([gram_id for gram_id, _ in known], dtype=np.intp),
+                np.array([count for _, count in known], dtype=np.float32),
+                unseen * self.unseen_idf ** 2)
+    
+    def classify(self, messages):
+        """Intent name or None for each lowercased message"""
+        rows = {}  # Distinct word -> row of the batch's word matrix
+        owners, windows, lengths = [], [], []
+        for owner, message in enumerate(messages):
+            words = self.WORD.findall(message)
+            word_rows = [rows.setdefault(word, len(rows)) for word in words]
+            for n in range(1, self.max_words + 1):
+                for i in range(len(words) - n + 1):
+                    if n == 1 and len(words[i]) < self.min_word_length:
+                        continue
+                    owners.append(owner)
+                    # Padded with -1, the all-zero last row
+                    windows.append(word_rows[i:i + n] + [-1] * (self.max_words - n))
+                    lengths.append(sum(len(word) for word in words[i:i + n]) + n - 1)
+        
+        intents = [None] * len(messages)
+        if not owners:
+            return intents
+        
+        word_counts = np.zeros((len(rows) + 1, len(self.vocabulary)), dtype=np.float32)
+        word_unseen = np.zeros(len(rows) + 1, dtype=np.float32)
+        for word, row in rows.items():
+            gram_ids, counts, unseen = self.word_grams(word)
+            word_counts[row, gram_ids] = counts
+            word_unseen[row] = unseen
+        
+        # A window's n-grams are its words' n-grams. Out-of-vocabulary n-grams only
+        # count towards the norm, and one shared by two words of a window is
+        # counted once per word.
+        windows = np.array(windows)
+        weights = word_counts[windows].sum(axis=1) * self.idf
+        norms = np.sqrt(np.einsum('ij,ij->i', weights, weights) + word_unseen[windows].sum(axis=1))
+        scores = weights @ self.matrix / norms[:, None]
+        comparable = (((windows >= 0).sum(axis=1)[:, None] == self.keyword_words)
+                      & (np.abs(np.array(lengths)[:, None] - self.keyword_lengths) <= self.length_slack))
+        scores[~comparable] = 0
+        best = scores.argmax(axis=1)
+        best_scores = scores[np.arange(len(best)), best]
+        
+        # Each message's best window: sort by owner, then score descending (stable, so earlier windows win ties)
+        owners = np.array(owners)
+        order = np.lexsort((-best_scores, owners))
+        _, first = np.unique(owners[order], return_index=True)
+        for window in order[first]:
+            if best_scores[window] >= self.min_score:
+                intents[owners[window]] = self.intents[best[window]]
+        return intents
+
 
 # Enhanced chatbot with conversational flow and button interactions
 class MuseumChatbot:
-    def __init__(self):
-        self.user_state = {}  # Track user conversation state
+    def __init__(self, state_store=None):
+        self.user_state = state_store if state_store is not None else ConversationStore()  # Track user conversation state
         self.conversation_flow = {
             'greeting': True,
             'logged_in': False,
             'wants_to_book': False,
-            'booking_in_progress': False
+            'booking_in_progress': False,
+            'last_intent': None,
+            'turns': 0
         }
+        # Cache language code -> {English reply: localized reply}
+        self.bundles = {}
+    
+    def load_bundle(self, lang, translations):
+        """Pre-build the replies for lang from {english: translated}; returns how many differ from English"""
+        bundle = {}
+        for response in all_responses():
+            localized = response.localized(translations)
+            if localized != response:
+                bundle[response] = localized
+        self.bundles[lang] = bundle
+        return len(bundle)
+    
+    def localize(self, response, lang):
+        """The pre-built reply for lang, or the English one if it has none"""
+        if lang is None or lang == 'en':
+            return response
+        return self.bundles.get(lang, {}).get(response, response)
+    
+    def get_response(self, user_message, user_id=None, logged_in=None, lang=None):
+        """Reply as a dict with 'text', 'buttons' and optional 'action'"""
+        return self.respond(user_message, user_id, logged_in, lang).to_dict()
+    
+    def respond(self, user_message, user_id=None, logged_in=None, lang=None):
+        """Reply as a shared, immutable ChatResponse; send its body as-is.
+
+        logged_in, when given, updates the login status remembered for user_id.
+        lang is a cache language code; replies come from its pre-built bundle
+        (see load_bundle), so nothing is translated here.
+        """
+        return self.localize(self.route(user_message, user_id, logged_in), lang)
     
-    def get_response(self, user_message, user_id=None):
+    def respond_many(self, user_messages, user_id=None, logged_in=None, lang=None):
+        """respond() for a batch of one user's messages, in order.
+
+        Messages the patterns miss are scored by the fuzzy classifier together.
+        """
+        user_messages = [message.lower().strip() for message in user_messages]
+        intents = [message if message.startswith('btn_') else self.match_intent(message) for message in user_messages]
+        unmatched = [i for i, intent in enumerate(intents) if intent is None]
+        if unmatched:
+            for i, intent in zip(unmatched, self.classifier.classify([user_messages[i] for i in unmatched])):
+                intents[i] = intent
+        return [self.localize(self.dispatch(message, intent, user_id, logged_in), lang)
+                for message, intent in zip(user_messages, intents)]
+    
+    def route(self, user_message, user_id=None, logged_in=None):
+        """The English reply for a message or button id"""
         user_message = user_message.lower().strip()
         
         # Handle button clicks (these would come from your frontend)
         if user_message.startswith('btn_'):
-            return self.handle_button_click(user_message, user_id)
+            intent = user_message
+        else:
+            # Pattern matching with conversational flow, then fuzzy matching for typos
+            intent = self.match_intent(user_message) or self.classifier.classify([user_message])[0]
+        return self.dispatch(user_message, intent, user_id, logged_in)
+    
+    def dispatch(self, user_message, intent, user_id=None, logged_in=None):
+        """Record the turn for user_id and build the reply for intent"""
+        if user_id is not None:
+            def track(state):
+                state['turns'] += 1
+                state['greeting'] = False
+                state['last_intent'] = intent
+                if logged_in is not None:
+                    state['logged_in'] = bool(logged_in)
+                if intent in ('booking', 'btn_book_tickets'):
+                    state['wants_to_book'] = True
+            
+            self.user_state.update(user_id, self.conversation_flow, track)
         
-        # Pattern matching with conversational flow
-        for pattern, handler in self.patterns.items():
-            if re.search(pattern, user_message):
-                return handler(user_message, user_id)
+        if user_message.startswith('btn_'):
+            return self.handle_button_click(user_message, user_id)
+        if intent is not None:
+            return getattr(self, self.INTENT_HANDLERS[intent])(user_message, user_id)
         
         # Default response with helpful suggestions
         return self.default_response()
     
     def handle_button_click(self, button_id, user_id):
         """Handle button clicks from the chat interface"""
-        responses = {
-            'btn_login': {
-                'text': "Great! Please click the login button below to access your account.",
-                'buttons': [],
-                'action': 'redirect_login'
-            },
-            'btn_register': {
-                'text': "Welcome to MuseumHub! Please click the register button below to create your account.",
-                'buttons': [],
-                'action': 'redirect_register'
-            },
-            'btn_book_tickets': {
-                'text': "Excellent! Let me guide you to our ticket booking page where you can select your preferred date and tickets.",
-                'buttons': [],
-                'action': 'redirect_booking'
-            },
-            'btn_view_tickets': {
-                'text': "Here are your booked tickets. You can view, download, or print them.",
-                'buttons': [],
-                'action': 'redirect_my_tickets'
-            },
-            'btn_cancel_ticket': {
-                'text': "I can help you cancel your ticket. Please note that cancellation is allowed within 48 hours of booking.",
-                'buttons': [
-                    {'id': 'btn_view_tickets', 'text': 'View My Tickets'},
-                    {'id': 'btn_main_menu', 'text': 'Main Menu'}
-                ]
-            },
-            'btn_pricing_info': {
-                'text': "Here's our pricing information:\n• Adult (18+): ₹150\n• Child (5-17): ₹80\n• Senior (60+): ₹100\n• Student (with ID): ₹60\n• Infant (below 5): Free",
-                'buttons': [
-                    {'id': 'btn_book_tickets', 'text': 'Book Tickets'},
-                    {'id': 'btn_main_menu', 'text': 'Main Menu'}
-                ]
-            },
-            'btn_museum_info': {
-                'text': "Museum Information:\n• Hours: 9:00 AM - 6:00 PM (Daily)\n• Location: Culture Street, Art District\n• Contact: +91 98765 43210\n• Facilities: Audio Guide, VR Experience, Photography allowed",
-                'buttons': [
-                    {'id': 'btn_book_tickets', 'text': 'Book Tickets'},
-                    {'id': 'btn_main_menu', 'text': 'Main Menu'}
-                ]
-            },
-            'btn_main_menu': {
-                'text': "What would you like to do?",
-                'buttons': [
-                    {'id': 'btn_book_tickets', 'text': '🎫 Book Tickets'},
-                    {'id': 'btn_view_tickets', 'text': '📋 My Tickets'},
-                    {'id': 'btn_pricing_info', 'text': '💰 Pricing'},
-                    {'id': 'btn_museum_info', 'text': '🏛️ Museum Info'}
-                ]
-            }
-        }
+        return BUTTON_RESPONSES.get(button_id) or self.default_response()
+    
+    # Intents in priority order: (name, pattern, handler method). The first intent
+    # whose pattern occurs anywhere in the message wins, as with sequential re.search.
+    INTENTS = [
+        # Greeting patterns
+        ('greeting', r'\b(hello|hi|hey|good morning|good evening|start)\b', 'handle_greeting'),
+        
+        # Help and support
+        ('help', r'\b(help|support|assist|what can you do)\b', 'handle_help'),
+        
+        # Booking related
+        ('booking', r'(book.*ticket|reserve.*ticket|buy.*ticket|want.*book|booking)', 'handle_booking_inquiry'),
+        
+        # Login/Register related
+        ('login', r'(login|log in|sign in|already registered|have account)', 'handle_login_inquiry'),
+        ('register', r'(register|sign up|create account|new user|new account)', 'handle_register_inquiry'),
+        
+        # Ticket management
+        ('view_tickets', r'(view.*ticket|my.*ticket|see.*ticket|check.*booking)', 'handle_view_tickets'),
+        ('cancel', r'(cancel.*ticket|refund|delete.*ticket)', 'handle_cancel_inquiry'),
+        
+        # Information requests
+        ('pricing', r'(price|cost|pricing|fee|rates|charges)', 'handle_pricing'),
+        ('timings', r'(timing|time|hours|open|closing|schedule)', 'handle_timings'),
+        ('contact', r'(location|address|where|contact|phone)', 'handle_contact'),
+        ('services', r'(services|facilities|amenities|features)', 'handle_services'),
+        
+        # Policies and rules
+        ('policies', r'(policy|policies|rules|guidelines|terms)', 'handle_policies'),
         
-        return responses.get(button_id, self.default_response())
+        # Goodbye
+        ('goodbye', r'\b(bye|goodbye|see you|thanks|thank you|exit)\b', 'handle_goodbye'),
+    ]
     
-    @property
-    def patterns(self):
-        return {
-            # Greeting patterns
-            r'\b(hello|hi|hey|good morning|good evening|start)\b': self.handle_greeting,
-            
-            # Help and support
-            r'\b(help|support|assist|what can you do)\b': self.handle_help,
-            
-            # Booking related
-            r'(book.*ticket|reserve.*ticket|buy.*ticket|want.*book|booking)': self.handle_booking_inquiry,
-            
-            # Login/Register related
-            r'(login|log in|sign in|already registered|have account)': self.handle_login_inquiry,
-            r'(register|sign up|create account|new user|new account)': self.handle_register_inquiry,
-            
-            # Ticket management
-            r'(view.*ticket|my.*ticket|see.*ticket|check.*booking)': self.handle_view_tickets,
-            r'(cancel.*ticket|refund|delete.*ticket)': self.handle_cancel_inquiry,
-            
-            # Information requests
-            r'(price|cost|pricing|fee|rates|charges)': self.handle_pricing,
-            r'(timing|time|hours|open|closing|schedule)': self.handle_timings,
-            r'(location|address|where|contact|phone)': self.handle_contact,
-            r'(services|facilities|amenities|features)': self.handle_services,
-            
-            # Policies and rules
-            r'(policy|policies|rules|guidelines|terms)': self.handle_policies,
-            
-            # Goodbye
-            r'\b(bye|goodbye|see you|thanks|thank you|exit)\b': self.handle_goodbye,
-        }
+    # Compiled once, in priority order. Each compiled pattern keeps the regex
+    # engine's first-character prefilter, which a single combined alternation
+    # (lookahead per intent, or named-group union) loses; both measured slower.
+    INTENT_MATCHERS = tuple((name, re.compile(pattern).search) for name, pattern, _ in INTENTS)
+    INTENT_HANDLERS = {name: handler for name, _, handler in INTENTS}
+    # Fallback for messages no pattern matches, built once for every instance
+    classifier = IntentClassifier(INTENT_KEYWORDS)
+    
+    def match_intent(self, user_message):
+        """Name of the highest-priority intent in a lowercased message, or None"""
+        for name, search in self.INTENT_MATCHERS:
+            if search(user_message):
+                return name
+        return None
     
     def handle_greeting(self, message, user_id):
-        greetings = [
-            "Hello! Welcome to MuseumHub 🏛️",
-            "Hi there! Welcome to our museum booking assistant!",
-            "Hey! Great to see you at MuseumHub!"
-        ]
-        
-        greeting = random.choice(greetings)
-        
         # Check if user is logged in (this would come from your session)
         is_logged_in = self.check_user_login_status(user_id)
-        
-        if is_logged_in:
-            return {
-                'text': f"{greeting}\n\nWelcome back! What would you like to do today?",
-                'buttons': [
-                    {'id': 'btn_book_tickets', 'text': '🎫 Book New Tickets'},
-                    {'id': 'btn_view_tickets', 'text': '📋 My Tickets'},
-                    {'id': 'btn_museum_info', 'text': '🏛️ Museum Info'},
-                    {'id': 'btn_pricing_info', 'text': '💰 Pricing'}
-                ]
-            }
-        else:
-            return {
-                'text': f"{greeting}\n\nTo get started, please choose an option:",
-                'buttons': [
-                    {'id': 'btn_login', 'text': '🔐 Login'},
-                    {'id': 'btn_register', 'text': '✨ Register'},
-                    {'id': 'btn_museum_info', 'text': '🏛️ Museum Info'},
-                    {'id': 'btn_pricing_info', 'text': '💰 View Pricing'}
-                ]
-            }
+        return random.choice(RESPONSES['greeting:member' if is_logged_in else 'greeting:guest'])
     
     def handle_help(self, message, user_id):
-        return {
-            'text': "I'm here to help you with your museum visit! I can assist you with:\n\n• Ticket booking and management\n• Pricing information\n• Museum details and timings\n• Policies and guidelines\n\nWhat would you like to know more about?",
-            'buttons': [
-                {'id': 'btn_book_tickets', 'text': '🎫 Book Tickets'},
-                {'id': 'btn_pricing_info', 'text': '💰 Pricing'},
-                {'id': 'btn_museum_info', 'text': '🏛️ Museum Info'},
-                {'id': 'btn_view_tickets', 'text': '📋 My Tickets'}
-            ]
-        }
+        return RESPONSES['help']
     
     def handle_booking_inquiry(self, message, user_id):
         is_logged_in = self.check_user_login_status(user_id)
-        
-        if is_logged_in:
-            return {
-                'text': "Perfect! I'd love to help you book tickets. Our booking system allows you to:\n\n• Choose your visit date\n• Select ticket types and quantities\n• Add optional services (Audio guide, VR experience)\n• Make secure payment\n\nReady to start booking?",
-                'buttons': [
-                    {'id': 'btn_book_tickets', 'text': '🎫 Start Booking'},
-                    {'id': 'btn_pricing_info', 'text': '💰 View Pricing First'}
-                ]
-            }
-        else:
-            return {
-                'text': "I'd be happy to help you book tickets! However, you'll need to login or create an account first to proceed with booking.\n\nWould you like to:",
-                'buttons': [
-                    {'id': 'btn_login', 'text': '🔐 Login to Existing Account'},
-                    {'id': 'btn_register', 'text': '✨ Create New Account'},
-                    {'id': 'btn_pricing_info', 'text': '💰 View Pricing First'}
-                ]
-            }
+        return RESPONSES['booking:member' if is_logged_in else 'booking:guest']
     
     def handle_login_inquiry(self, message, user_id):
-        return {
-            'text': "Great! If you already have an account, please click below to login:",
-            'buttons': [
-                {'id': 'btn_login', 'text': '🔐 Login Now'},
-                {'id': 'btn_register', 'text': '✨ Create Account Instead'}
-            ]
-        }
+        return RESPONSES['login']
     
     def handle_register_inquiry(self, message, user_id):
-        return {
-            'text': "Welcome to MuseumHub! Creating an account is quick and easy. You'll be able to:\n\n• Book tickets online\n• Manage your bookings\n• View booking history\n• Get exclusive offers\n\nReady to join us?",
-            'buttons': [
-                {'id': 'btn_register', 'text': '✨ Create Account'},
-                {'id': 'btn_login', 'text': '🔐 Login to Existing Account'}
-            ]
-        }
+        return RESPONSES['register']
     
     def handle_view_tickets(self, message, user_id):
         is_logged_in = self.check_user_login_status(user_id)
-        
-        if is_logged_in:
-            return {
-                'text': "Let me show you your tickets. You can view, download, print, or manage your bookings.",
-                'buttons': [
-                    {'id': 'btn_view_tickets', 'text': '📋 View My Tickets'},
-                    {'id': 'btn_book_tickets', 'text': '🎫 Book More Tickets'}
-                ]
-            }
-        else:
-            return {
-                'text': "To view your tickets, please login to your account first:",
-                'buttons': [
-                    {'id': 'btn_login', 'text': '🔐 Login'},
-                    {'id': 'btn_register', 'text': '✨ Create Account'}
-                ]
-            }
+        return RESPONSES['view_tickets:member' if is_logged_in else 'view_tickets:guest']
     
     def handle_cancel_inquiry(self, message, user_id):
-        return {
-            'text': "I can help you with ticket cancellation. Please note our cancellation policy:\n\n• Cancellation allowed within 48 hours of booking\n• No refund if you miss your scheduled visit\n• Processing may take 3-5 business days\n\nWould you like to view your tickets to proceed with cancellation?",
-            'buttons': [
-                {'id': 'btn_view_tickets', 'text': '📋 View My Tickets'},
-                {'id': 'btn_main_menu', 'text': '🏠 Main Menu'}
-            ]
-        }
+        return RESPONSES['cancel']
     
     def handle_pricing(self, message, user_id):
-        return {
-            'text': "Here's our current pricing:\n\n🎫 **Ticket Prices:**\n• Adult (18+): ₹150\n• Child (5-17): ₹80\n• Senior Citizen (60+): ₹100\n• Student (with ID): ₹60\n• Infant (below 5): Free\n\n🎯 **Add-on Services:**\n• Audio Guide: ₹50/device\n• VR Experience: ₹100/person\n• Photography Pass: ₹200/group\n• Guided Tour: ₹300/group",
-            'buttons': [
-                {'id': 'btn_book_tickets', 'text': '🎫 Book Now'},
-                {'id': 'btn_main_menu', 'text': '🏠 Main Menu'}
-            ]
-        }
+        return RESPONSES['pricing']
     
     def handle_timings(self, message, user_id):
-        return {
-            'text': "🕒 Museum Timings:\n• Open: 9:00 AM\n• Close: 5:00 PM\n• Last Entry: 4:30 PM\n\nLet me know if you'd like to book tickets!",
-            'buttons': [
-                {'id': 'btn_book_tickets', 'text': '🎫 Book Tickets'},
-                {'id': 'btn_main_menu', 'text': '🏠 Main Menu'}
-            ]
-        }
-
+        return RESPONSES['timings']
     
     def handle_contact(self, message, user_id):
-        return {
-            'text': "📍 **Museum Location & Contact:**\n\n🏛️ MuseumHub\n123 Culture Street, Art District\nCity, State - 123456\n\n📞 Phone: +91 98765 43210\n📧 Email: info@museumhub.com\n🌐 Website: www.museumhub.com",
-            'buttons': [
-                {'id': 'btn_book_tickets', 'text': '🎫 Book Tickets'},
-                {'id': 'btn_main_menu', 'text': '🏠 Main Menu'}
-            ]
-        }
+        return RESPONSES['contact']
     
     def handle_services(self, message, user_id):
-        return {
-            'text': "🏛️ **Our Services:**\n\n✅ **Available Services:**\n• Online ticket booking\n• Audio guides in multiple languages\n• VR experiences\n• Guided tours\n• Photography permissions\n• Wheelchair accessibility\n• Gift shop\n• Cafeteria\n\n🎯 **Digital Services:**\n• Mobile tickets\n• Online cancellation\n• Booking history\n• Email notifications",
-            'buttons': [
-                {'id': 'btn_book_tickets', 'text': '🎫 Book Tickets'},
-                {'id': 'btn_pricing_info', 'text': '💰 View Pricing'},
-                {'id': 'btn_main_menu', 'text': '🏠 Main Menu'}
-            ]
-        }
+        return RESPONSES['services']
     
     def handle_policies(self, message, user_id):
-        return {
-            'text': "📋 **Museum Policies:**\n\n🔸 **Booking Rules:**\n• Minimum age for booking: 18 years\n• One booking per person at a time\n• Valid ID required at entry\n\n🔸 **Cancellation Policy:**\n• Cancel within 48 hours of booking\n• No refund for missed visits\n• Processing time: 3-5 business days\n\n🔸 **Visit Guidelines:**\n• Arrive 15 minutes before your slot\n• No outside food or drinks\n• Photography rules apply\n• Follow museum etiquette",
-            'buttons': [
-                {'id': 'btn_book_tickets', 'text': '🎫 Book Tickets'},
-                {'id': 'btn_main_menu', 'text': '🏠 Main Menu'}
-            ]
-        }
+        return RESPONSES['policies']
     
     def handle_goodbye(self, message, user_id):
-        farewell_messages = [
-            "Thank you for visiting MuseumHub! Have a wonderful day! 🏛️",
-            "Goodbye! We hope to see you at the museum soon! 👋",
-            "Thanks for chatting with me! Enjoy your museum experience! ✨"
-        ]
-        
-        return {
-            'text': random.choice(farewell_messages),
-            'buttons': [
-                {'id': 'btn_main_menu', 'text': '🏠 Start Over'},
-                {'id': 'btn_book_tickets', 'text': '🎫 Quick Book'}
-            ]
-        }
+        return random.choice(RESPONSES['goodbye'])
     
     def default_response(self):
-        return {
-            'text': "I'm not quite sure about that, but I'm here to help! I can assist you with:\n\n• Booking museum tickets\n• Viewing your tickets\n• Pricing information\n• Museum details and policies\n\nWhat would you like to know more about?",
-            'buttons': [
-                {'id': 'btn_book_tickets', 'text': '🎫 Book Tickets'},
-                {'id': 'btn_view_tickets', 'text': '📋 My Tickets'},
-                {'id': 'btn_museum_info', 'text': '🏛️ Museum Info'},
-                {'id': 'btn_pricing_info', 'text': '💰 Pricing'}
-            ]
-        }
+        return RESPONSES['default']
     
     def check_user_login_status(self, user_id):
-        """
-        This function should check if the user is logged in
-        You'll need to implement this based on your session management
-        For now, returning False as default
-        """
-        # In your Flask app, you can check session['user_id'] here
-        # return 'user_id' in session
-        return False  # Change this based on your session logic
+        """Login status last passed to respond() for this user; False for unknown users"""
+        if user_id is None:
+            return False
+        state = self.user_state.get(user_id)
+        return bool(state and state['logged_in'])
 
 # Initialize the chatbot
 chatbot = MuseumChatbot()
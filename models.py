@@ -1,16 +1,98 @@
+from datetime import datetime, timezone
+
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import inspect, update
 
 db = SQLAlchemy()
 
+def utc_now():
+    """The current UTC time, naive like the DateTime columns that store it"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
+    # The unique index on username also serves login's (username, password) lookup
     username = db.Column(db.String(80), unique=True, nullable=False)
     password = db.Column(db.String(120), nullable=False)
+    tickets = db.relationship('Ticket', backref='user', lazy=True)
+
+class Booking(db.Model):
+    """One group booking: the visitors' tickets point at it through ticket.booking_id"""
+    __table_args__ = (
+        # Mail campaigns: the bookings visiting on one day, in id order
+        db.Index('ix_booking_visit_date', 'visit_date', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    contact_email = db.Column(db.String(120), nullable=False)
+    contact_phone = db.Column(db.String(20))
+    visit_date = db.Column(db.Date)
+    created_at = db.Column(db.DateTime, nullable=False, default=utc_now)
+    tickets = db.relationship('Ticket', backref='booking', lazy=True)
 
 class Ticket(db.Model):
+    __table_args__ = (
+        # My Tickets pages: one user's tickets newest first by (created_at, id)
+        db.Index('ix_ticket_user_id_created_at', 'user_id', 'created_at', 'id'),
+        # The tickets of one group booking
+        db.Index('ix_ticket_booking_id', 'booking_id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     age = db.Column(db.Integer, nullable=False)
     email = db.Column(db.String(120), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    user = db.relationship('User', backref=db.backref('tickets', lazy=True))
+    created_at = db.Column(db.DateTime, nullable=False, default=utc_now)
+    # Set for tickets booked together through /bookings
+    booking_id = db.Column(db.Integer, db.ForeignKey('booking.id'))
+
+    @property
+    def visit_date(self):
+        """The booking's visit date; None for tickets booked on their own, which do not record one"""
+        return self.booking.visit_date if self.booking else None
+
+
+def upgrade_schema(connection):
+    """Bring a database created from any earlier version of these models up to date.
+
+    Creates missing tables, adds and backfills ticket.created_at (tickets that
+    predate it are dated now), adds ticket.booking_id and creates missing indexes. Every step checks
+    first, so it can run on every deploy. Works on PostgreSQL and SQLite; run
+    it inside a transaction. Returns a description of each change made.
+    """
+    changes = []
+    existing = set(inspect(connection).get_table_names())
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing:
+            table.create(connection)
+            changes.append(f"created table {table.name}")
+
+    if 'ticket' in existing:
+        columns = {column['name']: column for column in inspect(connection).get_columns('ticket')}
+        if 'created_at' not in columns:
+            # Added nullable: SQLite cannot add a NOT NULL column without a constant default
+            connection.exec_driver_sql('ALTER TABLE ticket ADD COLUMN created_at TIMESTAMP')
+            changes.append('added ticket.created_at')
+        undated = connection.execute(
+            update(Ticket.__table__).where(Ticket.created_at.is_(None)).values(created_at=utc_now())
+        ).rowcount
+        if undated:
+            changes.append(f"dated {undated} tickets without created_at")
+        if connection.dialect.name == 'postgresql' and columns.get('created_at', {}).get('nullable', True):
+            connection.exec_driver_sql('ALTER TABLE ticket ALTER COLUMN created_at SET NOT NULL')
+            changes.append('made ticket.created_at NOT NULL')
+        if 'booking_id' not in columns:
+            connection.exec_driver_sql('ALTER TABLE ticket ADD COLUMN booking_id INTEGER REFERENCES booking (id)')
+            changes.append('added ticket.booking_id')
+
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing:
+            continue
+        indexes = {index['name'] for index in inspect(connection).get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in indexes:
+                index.create(connection)
+                changes.append(f"created index {index.name}")
+    return changes
@@ -0,0 +1,35 @@
+"""Point every store the app opens at a temporary directory before app is imported."""
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+STORE_DIR = tempfile.mkdtemp(prefix='museumhub-tests-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(STORE_DIR, 'museum.db')}"
+os.environ['DATABASE_PATH'] = os.path.join(STORE_DIR, 'translations.db')
+os.environ['EMAIL_OUTBOX_PATH'] = os.path.join(STORE_DIR, 'outbox.db')
+
+import app as museum  # noqa: E402
+
+# Templates sit next to app.py rather than in templates/
+museum.app.jinja_loader.searchpath = [museum.app.root_path]
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(STORE_DIR, ignore_errors=True)
+
+
+@pytest.fixture
+def app():
+    museum.app.config['TESTING'] = True
+    return museum.app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,152 @@
+import itertools
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import func, select
+
+import app as museum
+from models import Booking, Ticket, User, db, upgrade_schema
+
+usernames = (f'visitor{n}' for n in itertools.count())
+
+
+@pytest.fixture
+def user_id(app):
+    with app.app_context():
+        with db.engine.begin() as connection:
+            upgrade_schema(connection)
+        user = User(username=next(usernames), password='secret')
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+
+def log_in(client, user_id):
+    with client.session_transaction() as session:
+        session['user_id'] = user_id
+
+
+def stored_counts(user_id):
+    with museum.app.app_context():
+        return {
+            'bookings': db.session.scalar(select(func.count(Booking.id)).where(Booking.user_id == user_id)),
+            'tickets': db.session.scalar(select(func.count(Ticket.id)).where(
+                Ticket.user_id == user_id, Ticket.booking_id.is_not(None))),
+        }
+
+
+def test_each_booking_stores_all_its_visitors(client, user_id):
+    log_in(client, user_id)
+    posted = {'bookings': 0, 'tickets': 0}
+    for size in (1, 10, 100):
+        visitors = [{'name': f'Visitor {i}', 'age': 35} for i in range(size)]
+        response = client.post('/bookings', json={'visitors': visitors, 'contact_email': 'group@example.com'})
+        assert response.status_code == 201, response.get_json()
+        assert response.get_json()['tickets'] == size
+        posted['bookings'] += 1
+        posted['tickets'] += size
+    assert stored_counts(user_id) == posted
+
+
+def test_invalid_visitor_stores_nothing(client, user_id):
+    log_in(client, user_id)
+    visitors = [{'name': 'Adult', 'age': 35}, {'name': '', 'age': 200}]
+    response = client.post('/bookings', json={'visitors': visitors, 'contact_email': 'group@example.com'})
+    assert response.status_code == 400
+    assert len(response.get_json()['errors']) == 2
+    assert stored_counts(user_id) == {'bookings': 0, 'tickets': 0}
+
+
+def test_visit_date_must_be_iso(client, user_id):
+    log_in(client, user_id)
+    response = client.post('/bookings', json={'visitors': [{'name': 'Adult', 'age': 35}],
+                                              'contact_email': 'group@example.com', 'visit_date': '12 March 2026'})
+    assert response.status_code == 400
+    assert response.get_json()['errors'] == ['visit_date must be a date as YYYY-MM-DD']
+
+
+def test_booking_reference_downloads_and_lists_the_visit_date(client, user_id):
+    log_in(client, user_id)
+    visitors = [{'name': 'Adult', 'age': 35}, {'name': 'Child', 'age': 8}]
+    response = client.post('/bookings', json={'visitors': visitors, 'contact_email': 'group@example.com',
+                                              'visit_date': '2026-03-12'})
+    reference = response.get_json()['booking_id']
+    assert reference.startswith('MUS24G')
+
+    pdf = client.get(f'/tickets/{reference}.pdf')
+    assert pdf.status_code == 200
+    assert pdf.mimetype == 'application/pdf'
+
+    tickets = client.get('/my_tickets/page').get_json()['tickets']
+    assert [ticket['visit_date'] for ticket in tickets] == ['12 March 2026'] * 2
+    assert client.get(f"/tickets/{tickets[0]['booking_id']}.pdf").status_code == 200
+
+    # Another user's booking is not found, whichever reference names it
+    log_in(client, user_id + 1)
+    assert client.get(f'/tickets/{reference}.pdf').status_code == 404
+    assert client.get(f"/tickets/{tickets[0]['booking_id']}.pdf").status_code == 404
+
+
+def test_campaign_reaches_the_bookings_visiting_that_day(client, user_id):
+    log_in(client, user_id)
+    for visit_date, size in (('2026-04-01', 3), ('2026-04-02', 2), ('2026-04-01', 1)):
+        visitors = [{'name': f'Visitor {i}', 'age': 35} for i in range(size)]
+        response = client.post('/bookings', json={'visitors': visitors, 'contact_email': 'group@example.com',
+                                                  'visit_date': visit_date})
+        assert response.status_code == 201
+    client.post('/book_ticket', data={'name': 'Walk-in', 'age': 35, 'email': 'walkin@example.com'})
+
+    with museum.app.app_context():
+        chunks = list(museum.campaign_booking_chunks(date(2026, 4, 1), chunk_size=1))
+    assert [len(chunk) for chunk in chunks] == [1, 1]
+    assert [len(booking['visitors']) for chunk in chunks for booking in chunk] == [3, 1]
+    assert {booking['visit_date'] for chunk in chunks for booking in chunk} == {'01 April 2026'}
+
+
+def test_ticket_pages_walk_every_ticket_once_when_times_tie(client, user_id):
+    # 45 tickets sharing three created_at values, so every page boundary falls inside a tie
+    times = [datetime(2026, 1, day, 9, 30) for day in (1, 2, 3)]
+    with museum.app.app_context():
+        tickets = [Ticket(name=f'Visitor {n}', age=35, email='visitor@example.com', user_id=user_id,
+                          created_at=times[n % 3]) for n in range(45)]
+        db.session.add_all(tickets)
+        db.session.commit()
+        expected = [ticket.id for ticket in sorted(tickets, key=lambda ticket: (ticket.created_at, ticket.id),
+                                                   reverse=True)]
+    log_in(client, user_id)
+
+    seen = []
+    cursor = None
+    while True:
+        page = client.get('/my_tickets/page', query_string={'limit': 7, **({'cursor': cursor} if cursor else {})})
+        assert page.status_code == 200
+        body = page.get_json()
+        seen.extend(ticket['id'] for ticket in body['tickets'])
+        cursor = body['next_cursor']
+        if cursor is None:
+            break
+    assert seen == expected
+    assert client.get('/my_tickets/page', query_string={'cursor': 'not-a-cursor'}).status_code == 400
+
+
+@pytest.mark.parametrize('options', [
+    {'workers': 10000}, {'workers': 0}, {'workers': 2.5}, {'workers': '4'}, {'workers': True},
+    {'rate': 0}, {'rate': -1}, {'rate': 1e9}, {'rate': 'fast'},
+])
+def test_campaign_options_out_of_range_are_rejected(app, client, monkeypatch, options):
+    monkeypatch.setitem(app.config, 'CAMPAIGN_API_TOKEN', 'secret')
+    response = client.post('/campaigns', json={'kind': 'reminder', 'date': '1999-01-01', **options},
+                           headers={'X-Campaign-Token': 'secret'})
+    assert response.status_code == 400
+    assert not any(key.startswith('reminder-1999-01-01') for key in museum.campaigns)
+
+
+def test_campaign_within_limits_starts(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, 'CAMPAIGN_API_TOKEN', 'secret')
+    headers = {'X-Campaign-Token': 'secret'}
+    response = client.post('/campaigns', json={'kind': 'reminder', 'date': '1999-01-02', 'workers': 2, 'rate': 5.5},
+                           headers=headers)
+    assert response.status_code == 202
+    assert client.get(response.get_json()['status_url'], headers=headers).status_code == 200
+    assert client.post('/campaigns', json={'kind': ['reminder'], 'date': '1999-01-02'},
+                       headers=headers).status_code == 400
@@ -0,0 +1,219 @@
+import json
+import random
+import re
+
+import app as museum
+from chatbot import BUTTON_RESPONSES, RESPONSES, ConversationStore, MuseumChatbot
+
+KEYWORDS = [
+    'hello', 'hi', 'hey', 'good morning', 'start', 'help', 'support', 'what can you do', 'book a ticket',
+    'reserve my ticket', 'buy ticket', 'want to book', 'booking', 'login', 'log in', 'sign in', 'have account',
+    'register', 'sign up', 'create account', 'new user', 'view ticket', 'my ticket', 'see ticket',
+    'check booking', 'cancel ticket', 'refund', 'delete ticket', 'price', 'cost', 'fee', 'rates', 'timing',
+    'hours', 'open', 'closing', 'schedule', 'location', 'address', 'where', 'contact', 'phone', 'services',
+    'facilities', 'amenities', 'policy', 'rules', 'terms', 'bye', 'goodbye', 'see you', 'thanks', 'thank you',
+    'exit', 'ticketing', 'history', 'this', 'shiny', 'bookshelf', 'opening', 'whereas', 'goodbyes', 'hit',
+]
+FILLER = ['the', 'museum', 'please', 'can', 'i', 'tomorrow', 'for', 'kids', 'and', 'gallery', 'a', '?', '!']
+
+
+def intent_corpus(size=3000, seed=1234):
+    """Seeded messages mixing keywords of several intents, and near misses, in random order"""
+    rng = random.Random(seed)
+    corpus = []
+    while len(corpus) < size:
+        words = rng.sample(KEYWORDS, rng.randrange(0, 4)) + rng.sample(FILLER, rng.randrange(0, 6))
+        rng.shuffle(words)
+        corpus.append(rng.choice([' ', ' ', '', '\n']).join(words))
+    return corpus
+
+
+def sequential_intent(message):
+    """Reference routing: one re.search per intent in priority order, as get_response used to do"""
+    for name, pattern, _ in MuseumChatbot.INTENTS:
+        if re.search(pattern, message):
+            return name
+    return None
+
+
+def test_precompiled_matchers_route_like_the_sequential_patterns():
+    bot = MuseumChatbot()
+    mismatches = [(message, sequential_intent(message), bot.match_intent(message))
+                  for message in intent_corpus() if sequential_intent(message) != bot.match_intent(message)]
+    assert not mismatches, mismatches[:5]
+
+
+def test_stream_cap_refuses_then_frees_a_slot(app, client):
+    saved = app.config['CHATBOT_STREAM_MAX_OPEN']
+    app.config['CHATBOT_STREAM_MAX_OPEN'] = 2
+    try:
+        streams = [client.get('/chatbot/stream', buffered=False) for _ in range(2)]
+        assert [stream.status_code for stream in streams] == [200, 200]
+
+        refused = client.get('/chatbot/stream', buffered=False)
+        assert refused.status_code == 503
+        assert refused.headers['Retry-After'] == '30'
+
+        streams.pop().close()
+        streams.append(client.get('/chatbot/stream', buffered=False))
+        assert streams[-1].status_code == 200
+    finally:
+        for stream in streams:
+            stream.close()
+        app.config['CHATBOT_STREAM_MAX_OPEN'] = saved
+    assert museum.chat_streams_open == 0
+
+
+def test_misspelt_messages_fall_back_to_the_closest_intent():
+    bot = MuseumChatbot()
+    messages = ['prise', 'bok tickts', 'regster', 'wat are the timngs', 'hw much']
+    assert [bot.match_intent(message) for message in messages] == [None] * len(messages)
+    assert bot.classifier.classify(messages) == ['pricing', 'booking', 'register', 'timings', 'pricing']
+    assert bot.get_response('prise') == bot.get_response('what are the prices')
+
+
+def test_off_topic_messages_get_the_default_reply():
+    bot = MuseumChatbot()
+    assert bot.classifier.classify(['the weather is lovely today', 'xyz', '']) == [None, None, None]
+    assert bot.respond('the weather is lovely today') is bot.default_response()
+
+
+def test_batch_replies_in_order_like_single_messages(client):
+    messages = ['prise', 'bok tickts', 'the weather is lovely today', 'what are the opening hours', 'btn_pricing_info']
+    response = client.post('/chatbot/batch', json={'messages': messages})
+    assert response.status_code == 200
+    expected = [museum.museum_chatbot.get_response(message, logged_in=False) for message in messages]
+    assert response.get_json()['replies'] == expected
+
+
+def test_batch_size_is_limited(app, client):
+    limit = app.config['CHATBOT_BATCH_MAX_MESSAGES']
+    assert client.post('/chatbot/batch', json={'messages': ['hi'] * limit}).status_code == 200
+    assert client.post('/chatbot/batch', json={'messages': ['hi'] * (limit + 1)}).status_code == 413
+    assert client.post('/chatbot/batch', json={'messages': []}).status_code == 400
+    assert client.post('/chatbot/batch', json={'messages': ['hi', 3]}).status_code == 400
+
+
+# get_response() for every chat button before replies were built once as ChatResponses
+MENU = [{'id': 'btn_book_tickets', 'text': '🎫 Book Tickets'}, {'id': 'btn_view_tickets', 'text': '📋 My Tickets'},
+        {'id': 'btn_pricing_info', 'text': '💰 Pricing'}, {'id': 'btn_museum_info', 'text': '🏛️ Museum Info'}]
+PREVIOUS_BUTTON_REPLIES = {
+    'btn_login': {'text': 'Great! Please click the login button below to access your account.',
+                  'buttons': [], 'action': 'redirect_login'},
+    'btn_register': {'text': 'Welcome to MuseumHub! Please click the register button below to create your account.',
+                     'buttons': [], 'action': 'redirect_register'},
+    'btn_book_tickets': {'text': 'Excellent! Let me guide you to our ticket booking page where you can select '
+                                 'your preferred date and tickets.',
+                         'buttons': [], 'action': 'redirect_booking'},
+    'btn_view_tickets': {'text': 'Here are your booked tickets. You can view, download, or print them.',
+                         'buttons': [], 'action': 'redirect_my_tickets'},
+    'btn_cancel_ticket': {'text': 'I can help you cancel your ticket. Please note that cancellation is allowed '
+                                  'within 48 hours of booking.',
+                          'buttons': [{'id': 'btn_view_tickets', 'text': 'View My Tickets'},
+                                      {'id': 'btn_main_menu', 'text': 'Main Menu'}]},
+    'btn_pricing_info': {'text': "Here's our pricing information:\n• Adult (18+): ₹150\n• Child (5-17): ₹80\n"
+                                 '• Senior (60+): ₹100\n• Student (with ID): ₹60\n• Infant (below 5): Free',
+                         'buttons': [{'id': 'btn_book_tickets', 'text': 'Book Tickets'},
+                                     {'id': 'btn_main_menu', 'text': 'Main Menu'}]},
+    'btn_museum_info': {'text': 'Museum Information:\n• Hours: 9:00 AM - 6:00 PM (Daily)\n'
+                                '• Location: Culture Street, Art District\n• Contact: +91 98765 43210\n'
+                                '• Facilities: Audio Guide, VR Experience, Photography allowed',
+                        'buttons': [{'id': 'btn_book_tickets', 'text': 'Book Tickets'},
+                                    {'id': 'btn_main_menu', 'text': 'Main Menu'}]},
+    'btn_main_menu': {'text': 'What would you like to do?', 'buttons': MENU},
+}
+
+
+def test_button_replies_keep_their_previous_shape():
+    bot = MuseumChatbot()
+    assert len(BUTTON_RESPONSES) == 8
+    assert {button: bot.get_response(button) for button in BUTTON_RESPONSES} == PREVIOUS_BUTTON_REPLIES
+    for button, response in BUTTON_RESPONSES.items():
+        assert json.loads(response.body) == PREVIOUS_BUTTON_REPLIES[button]
+
+
+def test_get_response_returns_a_fresh_dict():
+    bot = MuseumChatbot()
+    reply = bot.get_response('btn_main_menu')
+    reply['buttons'].clear()
+    assert bot.get_response('btn_main_menu')['buttons'] == MENU
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def touch(store, key):
+    store.update(key, {'turns': 0}, lambda state: state.update(turns=state['turns'] + 1))
+
+
+def test_conversation_store_evicts_the_least_recently_used_entry():
+    store = ConversationStore(max_entries=3, ttl=None)
+    for key in 'abc':
+        touch(store, key)
+    touch(store, 'a')  # b is now the least recently used
+    touch(store, 'd')
+    assert list(store.entries) == ['c', 'a', 'd']
+    assert store.get('a') == {'turns': 2}
+    assert store.get('b') is None
+    assert store.stats()['evictions'] == 1
+
+
+def test_conversation_store_expires_idle_entries():
+    clock = FakeClock()
+    store = ConversationStore(max_entries=10, ttl=60, clock=clock)
+    touch(store, 'idle')
+    clock.now = 30
+    touch(store, 'active')
+    clock.now = 61
+    assert store.get('idle') is None
+    assert store.get('active') == {'turns': 1}
+    clock.now = 91
+    assert len(store) == 1  # Expiry happens on the next access, not on a timer
+    assert store.get('active') is None
+    assert store.stats()['expirations'] == 2
+
+    # An expired conversation starts over from the defaults
+    touch(store, 'idle')
+    assert store.get('idle') == {'turns': 1}
+
+
+def test_login_status_follows_the_latest_message():
+    bot = MuseumChatbot(ConversationStore(max_entries=10))
+    assert bot.respond('book tickets', 'user:1', logged_in=True) is RESPONSES['booking:member']
+    assert bot.respond('book tickets', 'user:1') is RESPONSES['booking:member']
+    assert bot.respond('book tickets', 'user:1', logged_in=False) is RESPONSES['booking:guest']
+    assert bot.respond('book tickets', 'user:2') is RESPONSES['booking:guest']
+    assert bot.respond('book tickets') is RESPONSES['booking:guest']
+
+
+def test_chatbot_route_passes_the_session_login(client):
+    assert client.post('/chatbot', json={'message': 'book tickets'}).get_json() \
+        == RESPONSES['booking:guest'].to_dict()
+    with client.session_transaction() as session:
+        session['user_id'] = 1
+    assert client.post('/chatbot', json={'message': 'book tickets'}).get_json() \
+        == RESPONSES['booking:member'].to_dict()
+
+
+def test_failed_bundle_load_is_not_retried_and_replies_in_english(client, monkeypatch):
+    calls = []
+
+    def failing_load(langs=None):
+        calls.append(langs)
+        raise RuntimeError('translations.db is locked')
+
+    monkeypatch.setattr(museum, 'load_chatbot_bundles', failing_load)
+    monkeypatch.setattr(museum, 'chatbot_bundles_loaded', False)
+    monkeypatch.setattr(museum, 'chatbot_bundles_error', None)
+    monkeypatch.setattr(museum.museum_chatbot, 'bundles', {})
+    for _ in range(2):
+        response = client.post('/chatbot', json={'message': 'book tickets', 'lang': 'fr'})
+        assert response.status_code == 200
+        assert response.get_json() == RESPONSES['booking:guest'].to_dict()
+    assert calls == [None]
+    assert museum.chatbot_bundles_error == 'translations.db is locked'
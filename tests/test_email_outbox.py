@@ -0,0 +1,101 @@
+import sqlite3
+import threading
+import time
+
+import app as museum
+from app import EmailOutbox, SQLiteConnectionPool
+
+import pytest
+
+
+class Deliveries:
+    """deliver() for an outbox: records bookings and refuses the first `failures` attempts"""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.delivered = []
+        self.lock = threading.Lock()
+
+    def __call__(self, booking_data):
+        with self.lock:
+            if self.failures:
+                self.failures -= 1
+                raise ConnectionError('451 Try again later')
+            self.delivered.append(booking_data['booking_id'])
+
+
+@pytest.fixture
+def make_outbox(tmp_path):
+    outboxes = []
+
+    def make(deliver, **options):
+        options = dict(dict(workers=2, max_attempts=3, backoff=0.01, poll_interval=0.02), **options)
+        outbox = EmailOutbox(SQLiteConnectionPool(str(tmp_path / 'outbox.db')), deliver, **options)
+        outboxes.append(outbox)
+        return outbox
+
+    yield make
+    for outbox in outboxes:
+        outbox.stop(timeout=5)
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'condition not met before timeout'
+        time.sleep(0.01)
+
+
+def booking(booking_id):
+    return {'booking_id': booking_id, 'contact_email': 'visitor@example.com', 'visitors': []}
+
+
+def test_refused_deliveries_are_retried_and_each_booking_sent_once(make_outbox):
+    deliveries = Deliveries(failures=2)
+    outbox = make_outbox(deliveries)
+    outbox.start()
+    booking_ids = [f'MUS24{i:04d}' for i in range(10)]
+    for booking_id in booking_ids:
+        outbox.enqueue(booking(booking_id))
+
+    wait_for(lambda: all(outbox.status(booking_id)['status'] == 'sent' for booking_id in booking_ids))
+    assert sorted(deliveries.delivered) == booking_ids
+    assert sum(outbox.status(booking_id)['attempts'] for booking_id in booking_ids) == 12
+
+
+def test_booking_refused_every_time_is_dead_lettered(make_outbox, monkeypatch):
+    outbox = make_outbox(Deliveries(failures=100))
+    monkeypatch.setattr(museum, 'email_outbox', outbox)
+    outbox.start()
+    outbox.enqueue(booking('MUS24DEAD'))
+
+    wait_for(lambda: outbox.status('MUS24DEAD')['status'] == 'dead')
+    assert '451' in outbox.status('MUS24DEAD')['last_error']
+    status = museum.app.test_client().get('/send-ticket-email/MUS24DEAD/status').get_json()
+    assert status['status'] == 'dead'
+    assert status['attempts'] == 3
+    assert 'last_error' not in status  # The endpoint is unauthenticated; SMTP errors stay server-side
+
+    assert outbox.requeue_dead() == 1
+    assert outbox.status('MUS24DEAD')['status'] == 'pending'
+
+
+def test_worker_survives_a_transient_database_error(make_outbox, monkeypatch):
+    deliveries = Deliveries()
+    outbox = make_outbox(deliveries, workers=1)
+    next_due_in = outbox._next_due_in
+    errors = iter([sqlite3.OperationalError('database is locked')])
+
+    def flaky_next_due_in():
+        error = next(errors, None)
+        if error:
+            raise error
+        return next_due_in()
+
+    monkeypatch.setattr(outbox, '_next_due_in', flaky_next_due_in)
+    outbox.start()
+    time.sleep(0.1)
+    assert all(thread.is_alive() for thread in outbox.threads)
+
+    outbox.enqueue(booking('MUS240001'))
+    wait_for(lambda: outbox.status('MUS240001')['status'] == 'sent')
@@ -0,0 +1,53 @@
+from sqlalchemy import create_engine
+
+import app as museum
+from models import upgrade_schema
+
+# user and ticket as the first release created them
+LEGACY_SCHEMA = """
+CREATE TABLE user (
+    id INTEGER PRIMARY KEY, username VARCHAR(80) NOT NULL UNIQUE, password VARCHAR(120) NOT NULL
+);
+CREATE TABLE ticket (
+    id INTEGER PRIMARY KEY, name VARCHAR(100) NOT NULL, age INTEGER NOT NULL, email VARCHAR(120) NOT NULL,
+    user_id INTEGER NOT NULL REFERENCES user (id)
+);
+"""
+
+
+def legacy_engine(path):
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.begin() as connection:
+        for statement in LEGACY_SCHEMA.split(';')[:-1]:
+            connection.exec_driver_sql(statement)
+        connection.exec_driver_sql("INSERT INTO user (id, username, password) VALUES (1, 'legacy', 'legacy')")
+        connection.exec_driver_sql('INSERT INTO ticket (name, age, email, user_id) VALUES ' + ', '.join(
+            f"('Visitor {n}', 30, 'visitor{n}@example.com', 1)" for n in range(50)))
+    return engine
+
+
+def test_upgrade_dates_legacy_tickets_and_is_idempotent(tmp_path):
+    engine = legacy_engine(tmp_path / 'legacy.db')
+    try:
+        with engine.begin() as connection:
+            changes = upgrade_schema(connection)
+        assert 'added ticket.created_at' in changes
+        assert 'dated 50 tickets without created_at' in changes
+        assert 'added ticket.booking_id' in changes
+
+        with engine.begin() as connection:
+            assert upgrade_schema(connection) == []
+            assert connection.exec_driver_sql('SELECT COUNT(*) FROM ticket WHERE created_at IS NULL').scalar() == 0
+    finally:
+        engine.dispose()
+
+
+def test_hot_queries_read_through_an_index(tmp_path):
+    engine = legacy_engine(tmp_path / 'legacy.db')
+    try:
+        with museum.app.app_context(), engine.begin() as connection:
+            upgrade_schema(connection)
+            plans = museum.check_query_plans(connection)
+        assert {name: problems for name, (_, problems) in plans.items() if problems} == {}
+    finally:
+        engine.dispose()
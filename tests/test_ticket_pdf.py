@@ -0,0 +1,98 @@
+import io
+import threading
+import time
+import zipfile
+
+import pytest
+from reportlab import rl_config
+
+import ticket_pdf
+
+BOOKING = {
+    'booking_id': 'MUS240001',
+    'visit_date': '12 March 2026',
+    'total_amount': '₹450',
+    'contact_phone': '+91 98765 43210',
+    'contact_email': 'visitor@example.com',
+    'visitors': [{'name': 'Asha', 'age': 34}, {'name': 'Ravi', 'age': 9}],
+    'addons': 'Audio Guide',
+}
+
+
+def test_fast_path_skips_ascii85_without_changing_reportlab_config():
+    default = rl_config.useA85
+    assert b'ASCII85Decode' not in ticket_pdf.generate_ticket_pdf(BOOKING)
+    assert b'ASCII85Decode' not in ticket_pdf.generate_group_tickets_pdf([BOOKING], workers=1)
+    assert rl_config.useA85 == default
+    # Other PDFs the process builds keep ReportLab's own setting
+    assert (b'ASCII85Decode' in ticket_pdf.generate_ticket_pdf_platypus(BOOKING)) == bool(default)
+
+
+def test_concurrent_misses_render_a_booking_once():
+    renders = []
+    release = threading.Event()
+
+    def slow_render(booking_data, generated_on):
+        renders.append(booking_data['booking_id'])
+        release.wait(5)
+        return ticket_pdf.generate_ticket_pdf(booking_data, generated_on)
+
+    cache = ticket_pdf.TicketPDFCache(render=slow_render)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get(BOOKING))) for _ in range(8)]
+    for thread in threads[:4]:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    # Late arrivals, some while the first render's waiters are still finishing
+    for thread in threads[4:]:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert renders == ['MUS240001']
+    assert len({entry.etag for entry in results}) == 1
+    assert cache.render_locks == {}
+
+
+def test_group_tickets_render_in_process_on_one_cpu_or_for_small_batches(monkeypatch):
+    def no_pool(workers=None):
+        raise AssertionError('process pool used')
+
+    monkeypatch.setattr(ticket_pdf, 'group_ticket_pool', no_pool)
+    group = dict(BOOKING, visitors=[{'name': f'Visitor {i}', 'age': 30} for i in range(60)])
+
+    monkeypatch.setattr(ticket_pdf.os, 'cpu_count', lambda: 1)
+    assert ticket_pdf.generate_group_tickets_pdf([group], workers=4).startswith(b'%PDF')
+
+    monkeypatch.setattr(ticket_pdf.os, 'cpu_count', lambda: 8)
+    assert ticket_pdf.generate_group_tickets_pdf([BOOKING]).startswith(b'%PDF')
+
+
+def test_group_ticket_workers_are_capped_by_cpus_and_batch_size(monkeypatch):
+    monkeypatch.setattr(ticket_pdf.os, 'cpu_count', lambda: 4)
+    assert ticket_pdf.group_ticket_workers(61) == 4
+    assert ticket_pdf.group_ticket_workers(61, workers=16) == 4
+    assert ticket_pdf.group_ticket_workers(61, workers=2) == 2
+    assert ticket_pdf.group_ticket_workers(20) == 2
+    assert ticket_pdf.group_ticket_workers(3) == 1
+
+
+@pytest.mark.parametrize('bookings', [
+    ['MUS240001'],
+    [dict(BOOKING, visitors=3)],
+    [dict(BOOKING, visitors=[{'name': 'Asha'}])],
+    [dict(BOOKING, booking_id=['MUS240001'])],
+])
+def test_group_ticket_zip_rejects_bad_bookings_before_streaming(client, bookings):
+    response = client.post('/group-tickets', json={'bookings': bookings, 'format': 'zip'})
+    assert response.status_code == 400
+    assert response.get_json()['errors']
+
+
+def test_group_ticket_zip_holds_a_cover_and_a_ticket_per_visitor(client):
+    response = client.post('/group-tickets', json={'bookings': [BOOKING], 'format': 'zip'})
+    assert response.status_code == 200
+    names = zipfile.ZipFile(io.BytesIO(response.get_data())).namelist()
+    assert names == ['MUS240001/group_cover.pdf', 'MUS240001/museum_ticket_MUS240001-01.pdf',
+                     'MUS240001/museum_ticket_MUS240001-02.pdf']
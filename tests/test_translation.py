@@ -0,0 +1,210 @@
+import random
+import threading
+import time
+
+import app as museum
+from app import FastTranslator, LocalDictionaryBackend, PreTranslator, TranslationBackend, Untranslated
+
+import pytest
+
+
+class FlakyBackend(LocalDictionaryBackend):
+    """Dictionary backend that raises while down is set"""
+
+    def __init__(self, dictionary):
+        super().__init__(dictionary)
+        self.down = False
+        self.calls = 0
+
+    def translate_batch(self, texts, target_lang):
+        self.calls += 1
+        if self.down:
+            raise ConnectionError('backend unavailable')
+        return super().translate_batch(texts, target_lang)
+
+
+@pytest.fixture
+def flaky_translator(tmp_path, monkeypatch):
+    backend = FlakyBackend({'fr': {'Hello': 'Bonjour', 'Tickets': 'Billets'}})
+    translator = PreTranslator(str(tmp_path / 'translations.db'))
+    translator.fast_translator = FastTranslator(backend, max_workers=2, retries=0, backoff=0)
+    monkeypatch.setattr(museum, 'pre_translator', translator)
+    return translator, backend
+
+
+def post_translate(client, **headers):
+    return client.post('/translate', json={'texts': ['Hello', 'Tickets'], 'lang': 'fr', 'page_url': '/home'},
+                       headers=headers)
+
+
+def test_bundle_after_backend_outage_is_not_cached(client, flaky_translator):
+    translator, backend = flaky_translator
+    backend.down = True
+    response = post_translate(client)
+    assert response.status_code == 200
+    assert response.get_json()['translations'] == ['Hello', 'Tickets']
+    assert response.headers.get('ETag') is None
+    assert 'no-store' in response.headers['Cache-Control']
+    assert not translator.bundles.bundles
+
+    backend.down = False
+    response = post_translate(client)
+    assert response.get_json()['translations'] == ['Bonjour', 'Billets']
+    etag = response.headers['ETag']
+
+    # The recovered bundle is cached and revalidates
+    calls = backend.calls
+    response = post_translate(client, **{'If-None-Match': etag})
+    assert response.status_code == 304
+    assert backend.calls == calls
+
+
+def test_partial_outage_keeps_translated_strings_and_retries_the_rest(flaky_translator):
+    translator, backend = flaky_translator
+    translator.translate_page_bundle(['Hello'], 'fr', '/home')
+
+    backend.down = True
+    bundle = translator.translate_page_bundle(['Hello', 'Tickets'], 'fr', '/home')
+    assert bundle['partial']
+    assert museum.app.json.loads(bundle['body'])['translations'] == ['Bonjour', 'Tickets']
+
+    backend.down = False
+    bundle = translator.translate_page_bundle(['Hello', 'Tickets'], 'fr', '/home')
+    assert not bundle['partial']
+    assert museum.app.json.loads(bundle['body'])['translations'] == ['Bonjour', 'Billets']
+
+
+def stream_lines(response):
+    return [museum.app.json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def test_stream_ends_with_the_etag_of_a_stored_bundle(client, flaky_translator):
+    translator, backend = flaky_translator
+    body = {'texts': ['Hello', 'Tickets'], 'lang': 'fr', 'page_url': '/home', 'stream': True}
+    done = stream_lines(client.post('/translate', json=body))[-1]
+    assert done['done']
+
+    # The client stores the streamed page under this ETag; revalidating it must not re-translate
+    calls = backend.calls
+    response = client.post('/translate', json=dict(body, stream=False), headers={'If-None-Match': done['etag']})
+    assert response.status_code == 304
+    assert backend.calls == calls
+
+
+def test_stream_after_backend_outage_has_no_etag(client, flaky_translator):
+    translator, backend = flaky_translator
+    backend.down = True
+    body = {'texts': ['Hello', 'Tickets'], 'lang': 'fr', 'page_url': '/home', 'stream': True}
+    assert stream_lines(client.post('/translate', json=body))[-1] == {'done': True}
+    assert not translator.bundles.bundles
+
+
+def test_stream_that_times_out_waiting_on_another_flight_has_no_etag(client, flaky_translator):
+    translator, backend = flaky_translator
+    translator.fast_translator.batch_timeout = 0.05
+    # Another request owns 'Tickets' and never finishes it
+    owned, _ = translator._claim_in_flight(['Tickets'], 'fr')
+    try:
+        body = {'texts': ['Hello', 'Tickets'], 'lang': 'fr', 'page_url': '/home', 'stream': True}
+        lines = stream_lines(client.post('/translate', json=body))
+        assert [item['text'] for line in lines[:-1] for item in line['items']] == ['Bonjour']
+        assert lines[-1] == {'done': True}
+        assert not translator.bundles.bundles
+    finally:
+        translator._resolve_in_flight(owned, {'Tickets': 'Billets'}, 'fr')
+
+
+class RecordingBackend(LocalDictionaryBackend):
+    """Slow dictionary backend that records every string it is sent"""
+
+    def __init__(self):
+        super().__init__(latency=0.05)
+        self.lock = threading.Lock()
+        self.sent = []
+
+    def translate_batch(self, texts, target_lang):
+        with self.lock:
+            self.sent.extend(texts)
+        return super().translate_batch(texts, target_lang)
+
+
+def test_concurrent_misses_reach_the_backend_once(tmp_path):
+    translator = PreTranslator(str(tmp_path / 'translations.db'))
+    backend = RecordingBackend()
+    translator.fast_translator = FastTranslator(backend)
+    texts = [f'Exhibit {n}' for n in range(40)]
+    barrier = threading.Barrier(20)
+    results = []
+
+    def request():
+        barrier.wait()
+        results.append(translator.translate_texts(texts, 'fr'))
+
+    threads = [threading.Thread(target=request) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(backend.sent) == sorted(texts)
+    assert results == [[f'[fr] {text}' for text in texts]] * 20
+    assert translator.stats()['single_flight']['in_flight'] == 0
+
+
+class FakeBackend(TranslationBackend):
+    """Upper-cases each batch after a random delay; a batch holding a text in fail_once fails on its first try"""
+
+    name = 'fake'
+
+    def __init__(self, fail_once=(), **kwargs):
+        super().__init__(**kwargs)
+        self.fail_once = set(fail_once)
+        self.lock = threading.Lock()
+        self.batches = []
+
+    def translate_batch(self, texts, target_lang):
+        with self.lock:
+            self.batches.append(list(texts))
+            failing = self.fail_once & set(texts)
+            self.fail_once -= failing
+        time.sleep(random.uniform(0, 0.01))
+        if failing:
+            raise ConnectionError('temporarily unavailable')
+        return [text.upper() for text in texts]
+
+
+def test_batches_respect_the_backend_size_and_character_limits():
+    backend = FakeBackend(max_batch_size=3)
+    FastTranslator(backend).translate_batch_parallel([f'text {n}' for n in range(10)], 'fr')
+    assert sorted(len(batch) for batch in backend.batches) == [1, 3, 3, 3]
+
+    backend = FakeBackend(max_batch_chars=10)
+    FastTranslator(backend).translate_batch_parallel(['abcd'] * 5 + ['a' * 15], 'fr')
+    assert sorted(map(len, backend.batches)) == [1, 1, 2, 2]
+    assert ['a' * 15] in backend.batches
+
+
+def test_translations_keep_input_order_across_chunks():
+    texts = [f'exhibit {n}' if n % 7 else ' ' for n in range(100)]
+    backend = FakeBackend(max_batch_size=8)
+    translated = FastTranslator(backend, max_workers=8).translate_batch_parallel(texts, 'fr')
+    assert translated == [text.upper() for text in texts]
+    assert len(backend.batches) == 11
+
+
+def test_chunk_that_fails_once_is_retried():
+    backend = FakeBackend(fail_once={'exhibit 5'}, max_batch_size=4)
+    texts = [f'exhibit {n}' for n in range(12)]
+    translated = FastTranslator(backend, retries=1, backoff=0).translate_batch_parallel(texts, 'fr')
+    assert translated == [text.upper() for text in texts]
+    assert backend.batches.count(['exhibit 4', 'exhibit 5', 'exhibit 6', 'exhibit 7']) == 2
+    assert len(backend.batches) == 4
+
+
+def test_chunk_that_keeps_failing_falls_back_to_untranslated():
+    backend = FakeBackend(fail_once={'exhibit 5'}, max_batch_size=4)
+    texts = [f'exhibit {n}' for n in range(8)]
+    translated = FastTranslator(backend, retries=0, backoff=0).translate_batch_parallel(texts, 'fr')
+    assert translated[:4] == [text.upper() for text in texts[:4]]
+    assert translated[4:] == texts[4:]
+    assert all(isinstance(text, Untranslated) for text in translated[4:])
@@ -0,0 +1,147 @@
+import hashlib
+import json
+import os
+import sqlite3
+
+import app as museum
+from app import FastTranslator, LocalDictionaryBackend, LRUCache, PreTranslator
+
+# translations as every release before the (target_lang, text_hash) key created it
+LEGACY_SCHEMA = """
+CREATE TABLE translations (
+    text_hash TEXT PRIMARY KEY,
+    original_text TEXT,
+    target_lang TEXT,
+    translated_text TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX idx_hash_lang ON translations (text_hash, target_lang);
+"""
+
+
+def legacy_database(path, rows):
+    """A schema-0 translations database holding (text, lang, translation, created_at) rows"""
+    conn = sqlite3.connect(path)
+    conn.executescript(LEGACY_SCHEMA)
+    conn.executemany(
+        'INSERT INTO translations (text_hash, original_text, target_lang, translated_text, created_at) '
+        'VALUES (?, ?, ?, ?, ?)',
+        [(hashlib.md5(f"{text}_{lang}".encode()).hexdigest(), text, lang, translation, created_at)
+         for text, lang, translation, created_at in rows])
+    conn.commit()
+    conn.close()
+
+
+def test_legacy_translations_are_rekeyed_once(tmp_path):
+    path = str(tmp_path / 'translations.db')
+    legacy_database(path, [
+        ('Hello', 'fn', 'Salut', '2024-01-01 10:00:00'),  # Legacy alias of fr, older than the fr row
+        ('Hello', 'fr', 'Bonjour', '2024-01-02 10:00:00'),
+        ('Welcome', 'ka', 'ಸ್ವಾಗತ', '2024-01-01 10:00:00'),
+        ('Tickets', 'hi', 'टिकट', '2024-01-01 10:00:00'),
+        ('Exit', 'fr', None, '2024-01-01 10:00:00'),  # Never translated: dropped
+    ])
+
+    translator = PreTranslator(path)
+    assert translator.get_cached_translation('Hello', 'fr') == 'Bonjour'
+    assert translator.get_cached_translation('Welcome', 'kn') == 'ಸ್ವಾಗತ'
+    assert translator.get_cached_translation('Tickets', 'hi') == 'टिकट'
+    assert translator.get_cached_translation('Exit', 'fr') is None
+    assert translator.stats()['lookups']['fr'] == {'hits': 1, 'misses': 1, 'hit_rate': 0.5}
+
+    conn = sqlite3.connect(path)
+    assert conn.execute('PRAGMA user_version').fetchone()[0] == 1
+    assert conn.execute('SELECT target_lang, COUNT(*) FROM translations GROUP BY target_lang ORDER BY 1').fetchall() \
+        == [('fr', 1), ('hi', 1), ('kn', 1)]
+    assert conn.execute("SELECT name FROM sqlite_master WHERE name = 'idx_hash_lang'").fetchone() is None
+    conn.close()
+
+    # Opening the migrated database again changes nothing
+    assert PreTranslator(path).get_cached_translation('Hello', 'fr') == 'Bonjour'
+    conn = sqlite3.connect(path)
+    assert conn.execute('SELECT COUNT(*) FROM translations').fetchone()[0] == 3
+    conn.close()
+
+
+def test_lru_evicts_least_recently_used_within_its_entry_bound():
+    cache = LRUCache(max_entries=3, max_bytes=1000)
+    for key in 'abc':
+        cache.put(key, key.upper())
+    assert cache.get('a') == 'A'  # b is now the least recently used
+    cache.put('d', 'D')
+    assert cache.get('b') is None
+    assert list(cache.entries) == ['c', 'a', 'd']
+    cache.put('e', 'E')
+    assert list(cache.entries) == ['a', 'd', 'e']
+    assert cache.stats()['evictions'] == 2
+
+
+def test_lru_stays_within_its_byte_bound():
+    cache = LRUCache(max_entries=100, max_bytes=10)
+    cache.put('x', '12345')
+    cache.put('y', '12345')
+    cache.put('z', 'é')  # Two bytes in UTF-8
+    assert list(cache.entries) == ['y', 'z']
+    assert cache.stats()['bytes'] == 7
+
+    # A value larger than the whole cache is not kept, and drops the old value
+    cache.put('y', '0' * 11)
+    assert cache.get('y') is None
+    assert cache.stats()['bytes'] == 2
+
+
+def test_add_does_not_replace_a_newer_value():
+    cache = LRUCache(max_entries=10, max_bytes=100)
+    cache.put('k', 'new')
+    cache.add('k', 'stale fill')
+    assert cache.get('k') == 'new'
+
+
+def test_overwriting_a_translation_refreshes_memory_and_page_bundles(tmp_path):
+    translator = PreTranslator(str(tmp_path / 'translations.db'))
+    translator.fast_translator = FastTranslator(LocalDictionaryBackend({'fr': {'Hello': 'Bonjour'}}))
+    translator.translate_page_bundle(['Hello'], 'fr', '/home')
+    # The first build translated 'Hello' itself, so only a build from the cache is stored
+    first = translator.translate_page_bundle(['Hello'], 'fr', '/home')
+    assert translator.bundles.get(('/home', 'fr', translator.bundles.content_hash(['Hello']))) is first
+    generation = translator.bundles.generation
+
+    translator.cache_translation('Hello', 'fr', 'Salut')
+    assert translator.memory_cache.get(('fr', translator._get_text_hash('Hello'))) == 'Salut'
+    assert translator.bundles.generation > generation
+    assert not translator.bundles.bundles
+
+    second = translator.translate_page_bundle(['Hello'], 'fr', '/home')
+    assert museum.app.json.loads(second['body'])['translations'] == ['Salut']
+    assert second['etag'] != first['etag']
+
+
+def test_bundle_built_across_an_overwrite_is_not_stored(tmp_path):
+    translator = PreTranslator(str(tmp_path / 'translations.db'))
+    generation = translator.bundles.generation
+    translator.cache_translation('Hello', 'fr', 'Salut')
+    bundle = translator.bundles.put(('/home', 'fr', 'hash'), [('fr', 'hash')], b'{}', generation)
+    assert bundle['etag']
+    assert not translator.bundles.bundles
+
+
+def test_legacy_original_texts_file_is_imported_once(tmp_path, monkeypatch):
+    legacy_file = tmp_path / 'original_texts.json'
+    legacy_file.write_text(json.dumps({'/home': ['Hello', 'Tickets'], '/about': ['Welcome']}), encoding='utf-8')
+    monkeypatch.setitem(museum.app.config, 'ORIGINAL_TEXTS_PATH', str(legacy_file))
+    path = str(tmp_path / 'translations.db')
+
+    manager = PreTranslator(path).text_manager
+    assert manager.get_original_texts('/home') == ['Hello', 'Tickets']
+    assert manager.get_original_texts('/about') == ['Welcome']
+    assert not legacy_file.exists()
+    assert os.path.exists(f'{legacy_file}.migrated')
+
+    # Texts saved since are not overwritten by the file, even if it comes back
+    manager.save_original_texts('/home', ['Hello', 'Tickets', 'Exit'])
+    os.replace(f'{legacy_file}.migrated', legacy_file)
+    manager = PreTranslator(path).text_manager
+    assert manager.get_original_texts('/home') == ['Hello', 'Tickets', 'Exit']
+    conn = sqlite3.connect(path)
+    assert conn.execute('SELECT COUNT(*) FROM original_texts').fetchone()[0] == 2
+    conn.close()
@@ -0,0 +1,914 @@
+"""Ticket PDF rendering.
+
+Styles and the static sections of the ticket are compiled once at import.
+generate_ticket_pdf draws a ticket straight onto a canvas, reproducing the
+platypus layout of build_ticket_story, and falls back to platypus when a
+flowable would have to be split across pages.
+
+Group bookings get a cover sheet plus one page per visitor, laid out in a
+process pool and merged into one PDF or streamed as a ZIP.
+
+TicketPDFCache keeps rendered tickets keyed by their booking data, in memory
+and optionally on disk.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import zipfile
+from collections import namedtuple, OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from io import BytesIO
+
+from reportlab import rl_config
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.pdfgen import canvas
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+
+PAGE_WIDTH, PAGE_HEIGHT = A4
+MARGIN_TOP = MARGIN_BOTTOM = 0.5 * inch
+MARGIN_SIDE = inch  # SimpleDocTemplate default
+FRAME_PADDING = 6
+FRAME_X = MARGIN_SIDE + FRAME_PADDING
+FRAME_TOP = PAGE_HEIGHT - MARGIN_TOP - FRAME_PADDING
+FRAME_BOTTOM = MARGIN_BOTTOM + FRAME_PADDING
+FRAME_WIDTH = PAGE_WIDTH - 2 * MARGIN_SIDE - 2 * FRAME_PADDING
+FUZZ = 1e-6
+
+# Fonts in the order the ticket first uses them. Pinning their internal names
+# (/F1, /F2, ...) on every canvas keeps precompiled operators valid.
+TICKET_FONTS = ('Helvetica', 'Helvetica-Bold', 'ZapfDingbats')
+
+BOOKING_COL_WIDTHS = [2 * inch, 4 * inch]
+VISITOR_COL_WIDTHS = [0.5 * inch, 3 * inch, 1 * inch]
+CELL_PADDING = 3  # Table default top/bottom padding
+CELL_SIDE_PADDING = 6  # Table default left/right padding
+
+BRAND_BLUE = colors.HexColor('#1e3a8a')
+LABEL_BLUE = colors.HexColor('#e6f2ff')
+
+MUSEUM_INFO = [
+    "• Address: 123 Culture Street, Art District, City - 560001",
+    "• Operating Hours: 9:00 AM - 6:00 PM (Tuesday to Sunday)",
+    "• Contact: +91 98765 43210 | info@museumhub.com",
+    "• Website: www.museumhub.com"
+]
+
+INSTRUCTIONS = [
+    "• Please present this ticket at the museum entrance",
+    "• Arrive 15 minutes before your scheduled visit time",
+    "• This ticket is valid for single entry only",
+    "• Ticket is non-refundable and non-transferable",
+    "• Children under 5 must be accompanied by an adult",
+    "• Photography may be restricted in certain areas",
+    "• Food and drinks are not allowed in exhibition areas"
+]
+
+
+def _build_styles():
+    """Paragraph styles used on the ticket"""
+    styles = getSampleStyleSheet()
+    return {
+        'title': ParagraphStyle(
+            'TitleStyle',
+            parent=styles['Heading1'],
+            fontSize=24,
+            textColor=BRAND_BLUE,
+            spaceAfter=30,
+            alignment=1  # Center aligned
+        ),
+        'header': ParagraphStyle(
+            'HeaderStyle',
+            parent=styles['Heading2'],
+            fontSize=14,
+            textColor=BRAND_BLUE,
+            spaceAfter=12
+        ),
+        'normal': ParagraphStyle(
+            'NormalStyle',
+            parent=styles['Normal'],
+            fontSize=10,
+            spaceAfter=6
+        ),
+        'footer': ParagraphStyle(
+            'FooterStyle',
+            parent=styles['Normal'],
+            fontSize=9,
+            textColor=colors.grey,
+            alignment=1
+        ),
+    }
+
+
+STYLES = _build_styles()
+
+BOOKING_TABLE_STYLE = TableStyle([
+    ('FONT', (0, 0), (-1, -1), 'Helvetica', 10),
+    ('BACKGROUND', (0, 0), (0, -1), LABEL_BLUE),
+    ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+    ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+    ('ALIGN', (1, 0), (1, -1), 'LEFT'),
+    ('FONT', (0, 0), (0, -1), 'Helvetica-Bold', 10),
+    ('BOX', (0, 0), (-1, -1), 1, colors.black),
+    ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+])
+
+VISITOR_TABLE_STYLE = TableStyle([
+    ('FONT', (0, 0), (-1, -1), 'Helvetica', 9),
+    ('BACKGROUND', (0, 0), (-1, 0), BRAND_BLUE),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONT', (0, 0), (-1, 0), 'Helvetica-Bold', 10),
+    ('BOX', (0, 0), (-1, -1), 1, colors.black),
+    ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+])
+
+
+def booking_rows(booking_data):
+    return [
+        ["Booking ID:", booking_data['booking_id']],
+        ["Visit Date:", booking_data['visit_date']],
+        ["Total Amount:", booking_data['total_amount']],
+        ["Contact:", booking_data['contact_phone']],
+        ["Email:", booking_data['contact_email']]
+    ]
+
+
+def visitor_rows(booking_data):
+    rows = [["No.", "Name", "Age"]]
+    for i, visitor in enumerate(booking_data['visitors'], 1):
+        rows.append([str(i), visitor['name'], str(visitor['age'])])
+    return rows
+
+
+def generated_on_text(generated_on=None):
+    return f"Generated on: {(generated_on or datetime.now()).strftime('%d %B %Y at %H:%M:%S')}"
+
+
+def build_ticket_story(booking_data, generated_on=None):
+    """The ticket as a platypus story"""
+    story = []
+
+    # Title
+    story.append(Paragraph("🎫 MUSEUMHUB DIGITAL TICKET", STYLES['title']))
+    story.append(Spacer(1, 20))
+
+    # Booking Information
+    story.append(Paragraph("📋 BOOKING DETAILS", STYLES['header']))
+    booking_table = Table(booking_rows(booking_data), colWidths=BOOKING_COL_WIDTHS)
+    booking_table.setStyle(BOOKING_TABLE_STYLE)
+    story.append(booking_table)
+    story.append(Spacer(1, 20))
+
+    # Visitors Information
+    story.append(Paragraph("👥 VISITORS", STYLES['header']))
+    visitor_table = Table(visitor_rows(booking_data), colWidths=VISITOR_COL_WIDTHS)
+    visitor_table.setStyle(VISITOR_TABLE_STYLE)
+    story.append(visitor_table)
+    story.append(Spacer(1, 20))
+
+    # Add-ons Information
+    story.append(Paragraph("🎯 ADD-ONS & SERVICES", STYLES['header']))
+    story.append(Paragraph(f"Additional Services: {booking_data['addons']}", STYLES['normal']))
+    story.append(Spacer(1, 20))
+
+    # Museum Information
+    story.append(Paragraph("📍 MUSEUM INFORMATION", STYLES['header']))
+    for info in MUSEUM_INFO:
+        story.append(Paragraph(info, STYLES['normal']))
+    story.append(Spacer(1, 20))
+
+    # Important Instructions
+    story.append(Paragraph("⚠️ IMPORTANT INSTRUCTIONS", STYLES['header']))
+    for instruction in INSTRUCTIONS:
+        story.append(Paragraph(instruction, STYLES['normal']))
+    story.append(Spacer(1, 20))
+
+    # Footer
+    story.append(Paragraph("Thank you for choosing MuseumHub! We hope you enjoy your visit.", STYLES['footer']))
+    story.append(Paragraph(generated_on_text(generated_on), STYLES['footer']))
+    return story
+
+
+def generate_ticket_pdf_platypus(booking_data, generated_on=None):
+    """Lay the ticket out with platypus; handles any content, including page splits"""
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=MARGIN_TOP, bottomMargin=MARGIN_BOTTOM)
+    doc.build(build_ticket_story(booking_data, generated_on))
+    pdf_content = buffer.getvalue()
+    buffer.close()
+    return pdf_content
+
+
+# A flowable reduced to its frame metrics and a draw(canvas, x, y) callback,
+# where (x, y) is its bottom-left corner as platypus would place it
+Block = namedtuple('Block', 'height space_before space_after splittable draw')
+
+
+def paragraph_block(text, style, width=FRAME_WIDTH):
+    """A paragraph broken into lines by platypus itself, or None if it uses styled markup"""
+    paragraph = Paragraph(text, style)
+    paragraph.wrap(width, PAGE_HEIGHT)
+    layout = paragraph.blPara
+    if layout.kind == 0:
+        broken = [(' '.join(words), extra_space) for extra_space, words in layout.lines]
+    else:
+        # Entities such as & produce fragment lines; accept them while every fragment is plain text
+        broken = []
+        for line in layout.lines:
+            if any(frag.fontName != style.fontName or frag.fontSize != style.fontSize
+                   or frag.textColor != style.textColor or frag.rise or frag.link
+                   for frag in line.words):
+                return None
+            broken.append((''.join(frag.text for frag in line.words), line.extraSpace))
+
+    lines = [text for text, extra_space in broken]
+    offsets = [extra_space / 2 if style.alignment == 1 else 0 for text, extra_space in broken]
+    height = len(lines) * style.leading
+
+    def draw(c, x, y):
+        c.setFillColor(style.textColor)
+        c.setFont(style.fontName, style.fontSize, style.leading)
+        baseline = y + height - style.fontSize
+        for line, offset in zip(lines, offsets):
+            c.drawString(x + offset, baseline, line)
+            baseline -= style.leading
+
+    return Block(height, style.spaceBefore, style.spaceAfter, len(lines) > 1, draw)
+
+
+def spacer_block(height):
+    return Block(height, 0, 0, False, lambda c, x, y: None)
+
+
+def _draw_grid(c, x, y, col_widths, row_heights):
+    """BOX in black then GRID in grey, as the ticket TableStyles do"""
+    width = sum(col_widths)
+    height = sum(row_heights)
+    c.setLineCap(1)
+    c.setLineJoin(1)
+    c.setLineWidth(1)
+    c.setStrokeColor(colors.black)
+    c.rect(x, y, width, height, stroke=1, fill=0)
+    c.setStrokeColor(colors.grey)
+    c.rect(x, y, width, height, stroke=1, fill=0)
+    top = y + height
+    for row_height in row_heights[:-1]:
+        top -= row_height
+        c.line(x, top, x + width, top)
+    left = x
+    for col_width in col_widths[:-1]:
+        left += col_width
+        c.line(left, y, left, y + height)
+
+
+def booking_table_block(booking_data):
+    rows = booking_rows(booking_data)
+    row_height = 10 * 1.2 + 2 * CELL_PADDING
+    height = row_height * len(rows)
+    width = sum(BOOKING_COL_WIDTHS)
+
+    def draw(c, x, y):
+        x += (FRAME_WIDTH - width) / 2
+        c.setFillColor(LABEL_BLUE)
+        c.rect(x, y, BOOKING_COL_WIDTHS[0], height, stroke=0, fill=1)
+        c.setFillColor(colors.black)
+        baseline = y + height - row_height + CELL_PADDING + 10 * 1.2 - 10
+        for label, value in rows:
+            c.setFont('Helvetica-Bold', 10, 12)
+            c.drawString(x + CELL_SIDE_PADDING, baseline, label)
+            c.setFont('Helvetica', 10, 12)
+            c.drawString(x + BOOKING_COL_WIDTHS[0] + CELL_SIDE_PADDING, baseline, str(value))
+            baseline -= row_height
+        _draw_grid(c, x, y, BOOKING_COL_WIDTHS, [row_height] * len(rows))
+
+    return Block(height, 0, 0, len(rows) > 1, draw)
+
+
+def visitor_table_block(booking_data):
+    rows = visitor_rows(booking_data)
+    header_height = 10 * 1.2 + 2 * CELL_PADDING
+    row_height = 9 * 1.2 + 2 * CELL_PADDING
+    row_heights = [header_height] + [row_height] * (len(rows) - 1)
+    height = sum(row_heights)
+    width = sum(VISITOR_COL_WIDTHS)
+    centers = []
+    left = 0
+    for col_width in VISITOR_COL_WIDTHS:
+        centers.append(left + col_width / 2)
+        left += col_width
+
+    def draw(c, x, y):
+        x += (FRAME_WIDTH - width) / 2
+        c.setFillColor(BRAND_BLUE)
+        c.rect(x, y + height - header_height, width, header_height, stroke=0, fill=1)
+        c.setFillColor(colors.white)
+        c.rect(x, y, width, height - header_height, stroke=0, fill=1)
+
+        top = y + height
+        for index, (cells, cell_height) in enumerate(zip(rows, row_heights)):
+            if index == 0:
+                c.setFillColor(colors.white)
+                c.setFont('Helvetica-Bold', 10, 12)
+                baseline = top - cell_height + CELL_PADDING + 12 - 10
+            else:
+                if index == 1:
+                    c.setFillColor(colors.black)
+                    c.setFont('Helvetica', 9, 10.8)
+                baseline = top - cell_height + CELL_PADDING + 10.8 - 9
+            for center, text in zip(centers, cells):
+                c.drawCentredString(x + center, baseline, text)
+            top -= cell_height
+        _draw_grid(c, x, y, VISITOR_COL_WIDTHS, row_heights)
+
+    return Block(height, 0, 0, len(rows) > 1, draw)
+
+
+def new_canvas(buffer):
+    c = canvas.Canvas(buffer, pagesize=A4)
+    for font_name in TICKET_FONTS:
+        c._doc.getInternalFontName(font_name)
+    return c
+
+
+_flate_only_lock = threading.Lock()
+_flate_only_saves = 0
+_flate_only_previous = None
+
+
+@contextmanager
+def flate_only():
+    """Compress page streams with Flate alone while a fast-path canvas is saved.
+
+    ASCII85 on top only inflates streams and is pure Python here. ReportLab
+    reads the global rl_config.useA85 when the document is formatted, so it is
+    switched off for the duration of the save and restored once the last
+    overlapping save finishes, leaving every other PDF the process builds alone.
+    """
+    global _flate_only_saves, _flate_only_previous
+    with _flate_only_lock:
+        if not _flate_only_saves:
+            _flate_only_previous = rl_config.useA85
+            rl_config.useA85 = 0
+        _flate_only_saves += 1
+    try:
+        yield
+    finally:
+        with _flate_only_lock:
+            _flate_only_saves -= 1
+            if not _flate_only_saves:
+                rl_config.useA85 = _flate_only_previous
+
+
+def save_canvas(c):
+    with flate_only():
+        c.save()
+
+
+class PageRecorder(canvas.Canvas):
+    """Canvas that keeps each finished page's operators in pages instead of building a PDF"""
+
+    def __init__(self):
+        super().__init__(BytesIO(), pagesize=A4)
+        for font_name in TICKET_FONTS:
+            self._doc.getInternalFontName(font_name)
+        self.pages = []
+
+    def showPage(self):
+        self.pages.append('\n'.join(self._code))
+        self._startPage()
+
+
+def precompiled_block(block):
+    """The block with its PDF operators recorded once and replayed on each ticket"""
+    c = new_canvas(BytesIO())
+    start = len(c._code)
+    block.draw(c, 0, 0)
+    operators = '\n'.join(c._code[start:])
+
+    def draw(c, x, y):
+        c.saveState()
+        c.translate(x, y)
+        c._code.append(operators)
+        c.restoreState()
+
+    return block._replace(draw=draw)
+
+
+class TicketTemplate:
+    """Ticket layout with its static sections compiled once"""
+
+    def __init__(self):
+        self.title = [
+            paragraph_block("🎫 MUSEUMHUB DIGITAL TICKET", STYLES['title']),
+            spacer_block(20),
+            paragraph_block("📋 BOOKING DETAILS", STYLES['header']),
+        ]
+        self.visitors_header = [spacer_block(20), paragraph_block("👥 VISITORS", STYLES['header'])]
+        self.addons_header = [spacer_block(20), paragraph_block("🎯 ADD-ONS & SERVICES", STYLES['header'])]
+        self.static_sections = [spacer_block(20), paragraph_block("📍 MUSEUM INFORMATION", STYLES['header'])]
+        self.static_sections += [paragraph_block(info, STYLES['normal']) for info in MUSEUM_INFO]
+        self.static_sections += [spacer_block(20), paragraph_block("⚠️ IMPORTANT INSTRUCTIONS", STYLES['header'])]
+        self.static_sections += [paragraph_block(instruction, STYLES['normal']) for instruction in INSTRUCTIONS]
+        self.static_sections += [
+            spacer_block(20),
+            paragraph_block("Thank you for choosing MuseumHub! We hope you enjoy your visit.", STYLES['footer']),
+        ]
+
+        self.title = [precompiled_block(block) for block in self.title]
+        self.visitors_header = [precompiled_block(block) for block in self.visitors_header]
+        self.addons_header = [precompiled_block(block) for block in self.addons_header]
+        self.static_sections = [precompiled_block(block) for block in self.static_sections]
+
+    def blocks(self, booking_data, generated_on=None):
+        return (
+            self.title
+            + [booking_table_block(booking_data)]
+            + self.visitors_header
+            + [visitor_table_block(booking_data)]
+            + self.addons_header
+            + [paragraph_block(f"Additional Services: {booking_data['addons']}", STYLES['normal'])]
+            + self.static_sections
+            + [paragraph_block(generated_on_text(generated_on), STYLES['footer'])]
+        )
+
+    def render(self, booking_data, generated_on=None):
+        """Draw the ticket on a canvas, or return None if platypus would split a flowable"""
+        buffer = BytesIO()
+        c = new_canvas(buffer)
+        if not self.draw(c, booking_data, generated_on):
+            return None
+        save_canvas(c)
+        return buffer.getvalue()
+
+    def render_pages(self, booking_data, generated_on=None):
+        """The ticket's pages as PDF operator strings for a canvas from new_canvas, or None as for render"""
+        c = PageRecorder()
+        if not self.draw(c, booking_data, generated_on):
+            return None
+        return c.pages
+
+    def draw(self, c, booking_data, generated_on=None):
+        """Draw the ticket's pages on c; False, leaving c unusable, if platypus would split a flowable"""
+        y = FRAME_TOP
+        at_top = True
+        previous_space_after = 0
+
+        blocks = self.blocks(booking_data, generated_on)
+        if None in blocks:
+            return False
+
+        for block in blocks:
+            space = 0 if at_top else max(block.space_before - previous_space_after, 0)
+            if y - space - block.height < FRAME_BOTTOM - FUZZ:
+                if at_top or block.splittable:
+                    return False
+                # Move the flowable to the top of a new page, as platypus does
+                c.showPage()
+                y = FRAME_TOP
+                space = 0
+                previous_space_after = 0
+
+            y -= space + block.height
+            block.draw(c, FRAME_X, y)
+            y -= block.space_after
+            previous_space_after = block.space_after
+            at_top = False
+
+        c.showPage()
+        return True
+
+
+TICKET_TEMPLATE = TicketTemplate()
+
+
+def generate_ticket_pdf(booking_data, generated_on=None):
+    """Generate a PDF ticket with booking information"""
+    pdf_content = TICKET_TEMPLATE.render(booking_data, generated_on)
+    if pdf_content is None:
+        pdf_content = generate_ticket_pdf_platypus(booking_data, generated_on)
+    return pdf_content
+
+
+# Group tickets: a cover sheet listing the whole group, then one page per visitor.
+# Visitor pages are laid out in worker processes and returned as page operators,
+# which the parent replays onto a single canvas (or zips as separate PDFs).
+
+COVER_LINE = 14
+COVER_COLUMN_GAP = 18
+
+
+def visitor_bookings(booking_data):
+    """One single-visitor booking per visitor, with the booking id suffixed by the visitor number"""
+    return [
+        dict(booking_data, booking_id=f"{booking_data['booking_id']}-{i:02d}", visitors=[visitor])
+        for i, visitor in enumerate(booking_data['visitors'], 1)
+    ]
+
+
+def _fit(c, text, font_name, font_size, width):
+    """text shortened with an ellipsis to fit width"""
+    if c.stringWidth(text, font_name, font_size) <= width:
+        return text
+    while text and c.stringWidth(text + '…', font_name, font_size) > width:
+        text = text[:-1]
+    return text + '…'
+
+
+def draw_cover_sheet(c, booking_data, generated_on=None):
+    """Group summary and a two-column visitor roster, continued over as many pages as needed"""
+    visitors = booking_data['visitors']
+    rows = booking_rows(booking_data) + [
+        ["Visitors:", str(len(visitors))],
+        ["Add-ons:", booking_data['addons']],
+    ]
+    column_width = (FRAME_WIDTH - COVER_COLUMN_GAP) / 2
+    roster = [f"{i}. {visitor['name']} ({visitor['age']})" for i, visitor in enumerate(visitors, 1)]
+
+    def page_header(title):
+        c.setFillColor(BRAND_BLUE)
+        c.setFont('Helvetica-Bold', 20)
+        c.drawCentredString(PAGE_WIDTH / 2, FRAME_TOP - 20, title)
+        c.setFillColor(colors.grey)
+        c.setFont('Helvetica', 9)
+        c.drawCentredString(PAGE_WIDTH / 2, FRAME_BOTTOM, generated_on_text(generated_on))
+        return FRAME_TOP - 56
+
+    y = page_header("MUSEUMHUB GROUP BOOKING")
+    c.setFillColor(colors.black)
+    for label, value in rows:
+        c.setFont('Helvetica-Bold', 10)
+        c.drawString(FRAME_X, y, label)
+        c.setFont('Helvetica', 10)
+        c.drawString(FRAME_X + BOOKING_COL_WIDTHS[0], y, _fit(c, str(value), 'Helvetica', 10, BOOKING_COL_WIDTHS[1]))
+        y -= COVER_LINE
+    y -= COVER_LINE
+
+    start = 0
+    while True:
+        c.setFillColor(BRAND_BLUE)
+        c.setFont('Helvetica-Bold', 14)
+        c.drawString(FRAME_X, y, "VISITORS" if start == 0 else "VISITORS (continued)")
+        y -= COVER_LINE * 1.5
+
+        per_column = max(int((y - FRAME_BOTTOM - COVER_LINE) // COVER_LINE) + 1, 1)
+        page_roster = roster[start:start + 2 * per_column]
+        c.setFillColor(colors.black)
+        c.setFont('Helvetica', 10)
+        for n, line in enumerate(page_roster):
+            column, row = divmod(n, per_column)
+            c.drawString(FRAME_X + column * (column_width + COVER_COLUMN_GAP), y - row * COVER_LINE,
+                         _fit(c, line, 'Helvetica', 10, column_width))
+        c.showPage()
+
+        start += len(page_roster)
+        if start >= len(roster):
+            return
+        y = page_header("MUSEUMHUB GROUP BOOKING")
+
+
+def _render_group_pages(jobs):
+    """Process pool task: [(kind, booking_data, generated_on)] -> list of page operator lists"""
+    results = []
+    for kind, booking_data, generated_on in jobs:
+        if kind == 'cover':
+            c = PageRecorder()
+            draw_cover_sheet(c, booking_data, generated_on)
+            results.append(c.pages)
+        else:
+            pages = TICKET_TEMPLATE.render_pages(booking_data, generated_on)
+            if pages is None:
+                raise ValueError(f"Ticket {booking_data['booking_id']} does not fit on a page")
+            results.append(pages)
+    return results
+
+
+def _render_group_pdfs(jobs):
+    """Process pool task: [(kind, booking_data, generated_on)] -> list of PDF bytes"""
+    return [_pages_to_pdf(pages) for pages in _render_group_pages(jobs)]
+
+
+def _pages_to_pdf(pages):
+    buffer = BytesIO()
+    c = new_canvas(buffer)
+    for operators in pages:
+        c._code.append(operators)
+        c.showPage()
+    save_canvas(c)
+    return buffer.getvalue()
+
+
+_group_pools = {}
+_group_pools_lock = threading.Lock()
+
+
+def group_ticket_pool(workers=None):
+    """Shared process pool for group tickets, created on first use"""
+    workers = workers or os.cpu_count() or 1
+    with _group_pools_lock:
+        pool = _group_pools.get(workers)
+        if pool is None:
+            pool = _group_pools[workers] = ProcessPoolExecutor(max_workers=workers)
+        return pool
+
+
+def group_jobs(bookings, generated_on):
+    """(filename, job) for each page set: every booking's cover sheet, then its visitors' tickets"""
+    jobs = []
+    folders = set()
+    for n, booking_data in enumerate(bookings, 1):
+        folder = booking_data['booking_id']
+        if folder in folders:
+            folder = f"{folder}-{n}"
+        folders.add(folder)
+        jobs.append((f"{folder}/group_cover.pdf", ('cover', booking_data, generated_on)))
+        for visitor_booking in visitor_bookings(booking_data):
+            jobs.append((f"{folder}/museum_ticket_{visitor_booking['booking_id']}.pdf",
+                         ('ticket', visitor_booking, generated_on)))
+    return jobs
+
+
+# Below this many page sets per process, pickling and IPC cost more than the pool saves
+MIN_JOBS_PER_WORKER = 8
+
+
+def group_ticket_workers(job_count, workers=None):
+    """Processes worth rendering job_count page sets with; 1 means render in this process.
+
+    Never more than there are CPUs: on a single CPU extra processes only add
+    overhead (bench.py group_tickets measured 0.7-0.9x at 2 and 4 workers).
+    """
+    cpus = os.cpu_count() or 1
+    return max(min(workers or cpus, cpus, job_count // MIN_JOBS_PER_WORKER), 1)
+
+
+def _map_group_jobs(task, jobs, workers=None, tasks_per_worker=4):
+    """Run task over jobs in the process pool in contiguous batches; yields results in job order"""
+    workers = group_ticket_workers(len(jobs), workers)
+    if workers == 1:
+        yield from task(jobs)
+        return
+    batch_size = max(len(jobs) // (workers * tasks_per_worker), 1)
+    pool = group_ticket_pool(workers)
+    futures = [pool.submit(task, jobs[i:i + batch_size]) for i in range(0, len(jobs), batch_size)]
+    for future in futures:
+        yield from future.result()
+
+
+def generate_group_tickets_pdf(bookings, generated_on=None, workers=None):
+    """One PDF with, for each booking, a cover sheet followed by a ticket page per visitor"""
+    generated_on = generated_on or datetime.now()
+    jobs = [job for _, job in group_jobs(bookings, generated_on)]
+    buffer = BytesIO()
+    c = new_canvas(buffer)
+    for pages in _map_group_jobs(_render_group_pages, jobs, workers):
+        for operators in pages:
+            c._code.append(operators)
+            c.showPage()
+    save_canvas(c)
+    return buffer.getvalue()
+
+
+class _ZipStream:
+    """Unseekable sink for zipfile whose bytes are drained after each member"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def iter_group_tickets_zip(bookings, generated_on=None, workers=None):
+    """ZIP of every cover sheet and visitor ticket as separate PDFs, yielded as each file is ready"""
+    generated_on = generated_on or datetime.now()
+    named_jobs = group_jobs(bookings, generated_on)
+    stream = _ZipStream()
+    # PDFs are already Flate-compressed
+    with zipfile.ZipFile(stream, 'w', compression=zipfile.ZIP_STORED) as archive:
+        results = _map_group_jobs(_render_group_pdfs, [job for _, job in named_jobs], workers)
+        for (filename, _), pdf in zip(named_jobs, results):
+            archive.writestr(filename, pdf)
+            yield stream.drain()
+    yield stream.drain()
+
+
+def booking_key(booking_data):
+    """Content address of a booking: sha256 of its canonical JSON"""
+    canonical = json.dumps(booking_data, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+# A rendered ticket; etag is the sha256 of pdf
+CachedTicket = namedtuple('CachedTicket', 'key pdf etag generated_on')
+
+
+class TicketPDFCache:
+    """Rendered ticket PDFs keyed by booking_key, with a memory LRU tier and an optional disk tier.
+
+    The "Generated on" time is taken at the first render of a booking and kept with
+    the PDF, so re-sending or re-downloading a ticket serves the same bytes.
+    """
+
+    def __init__(self, max_entries=256, max_bytes=32 * 1024 * 1024, disk_dir=None, disk_max_bytes=256 * 1024 * 1024,
+                 render=generate_ticket_pdf):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self.render = render
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.disk_entries = OrderedDict()  # key -> file size, least recently used first
+        self.disk_bytes = 0
+        self.lock = threading.Lock()
+        self.render_locks = {}  # key -> [lock, requests using it]
+        self.hits = self.disk_hits = self.misses = self.evictions = self.disk_evictions = 0
+
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self._load_disk_index()
+
+    def get(self, booking_data):
+        """Cached ticket for booking_data, rendering it on a miss"""
+        key = booking_key(booking_data)
+        entry = self._lookup(key)
+        if entry is not None:
+            return entry
+
+        # One render per booking; concurrent requests for it wait and share the result.
+        # The lock stays registered until its last waiter is done, so a request
+        # arriving meanwhile queues on the same lock instead of rendering again.
+        with self.lock:
+            render_lock = self.render_locks.get(key)
+            if render_lock is None:
+                render_lock = self.render_locks[key] = [threading.Lock(), 0]
+            render_lock[1] += 1
+        try:
+            with render_lock[0]:
+                entry = self._lookup(key, count=False)
+                if entry is not None:
+                    return entry
+
+                generated_on = datetime.now()
+                pdf = self.render(booking_data, generated_on)
+                entry = CachedTicket(key, pdf, hashlib.sha256(pdf).hexdigest(), generated_on)
+                with self.lock:
+                    self.misses += 1
+                    self._put_memory(entry)
+                self._put_disk(entry)
+                return entry
+        finally:
+            with self.lock:
+                render_lock[1] -= 1
+                if not render_lock[1]:
+                    del self.render_locks[key]
+
+    def invalidate(self, booking_data):
+        key = booking_key(booking_data)
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is not None:
+                self.total_bytes -= len(entry.pdf)
+            size = self.disk_entries.pop(key, None)
+            if size is not None:
+                self.disk_bytes -= size
+        if size is not None:
+            self._remove_file(key)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'bytes': self.total_bytes,
+                'disk_entries': len(self.disk_entries),
+                'disk_bytes': self.disk_bytes,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'disk_evictions': self.disk_evictions,
+            }
+
+    def _lookup(self, key, count=True):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                if count:
+                    self.hits += 1
+                return entry
+            on_disk = key in self.disk_entries
+
+        if not on_disk:
+            return None
+
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                pdf = f.read()
+            # mtime holds the first render time; atime tracks use for eviction after a restart
+            modified = os.stat(path).st_mtime
+            os.utime(path, (time.time(), modified))
+            generated_on = datetime.fromtimestamp(modified)
+        except OSError:
+            with self.lock:
+                size = self.disk_entries.pop(key, None)
+                if size is not None:
+                    self.disk_bytes -= size
+            return None
+
+        entry = CachedTicket(key, pdf, hashlib.sha256(pdf).hexdigest(), generated_on)
+        with self.lock:
+            if key in self.disk_entries:
+                self.disk_entries.move_to_end(key)
+            if count:
+                self.disk_hits += 1
+            self._put_memory(entry)
+        return entry
+
+    def _put_memory(self, entry):
+        """Insert into the memory tier; caller holds self.lock"""
+        if len(entry.pdf) > self.max_bytes:
+            return
+        old = self.entries.pop(entry.key, None)
+        if old is not None:
+            self.total_bytes -= len(old.pdf)
+        self.entries[entry.key] = entry
+        self.total_bytes += len(entry.pdf)
+        while len(self.entries) > self.max_entries or self.total_bytes > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.total_bytes -= len(evicted.pdf)
+            self.evictions += 1
+
+    def _put_disk(self, entry):
+        if not self.disk_dir or len(entry.pdf) > self.disk_max_bytes:
+            return
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.disk_dir, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(entry.pdf)
+            timestamp = entry.generated_on.timestamp()
+            os.utime(tmp_path, (timestamp, timestamp))
+            os.replace(tmp_path, self._path(entry.key))
+        except OSError as e:
+            print(f"Error writing ticket PDF cache: {str(e)}")
+            return
+
+        evicted = []
+        with self.lock:
+            old_size = self.disk_entries.pop(entry.key, None)
+            if old_size is not None:
+                self.disk_bytes -= old_size
+            self.disk_entries[entry.key] = len(entry.pdf)
+            self.disk_bytes += len(entry.pdf)
+            while self.disk_bytes > self.disk_max_bytes:
+                key, size = self.disk_entries.popitem(last=False)
+                self.disk_bytes -= size
+                self.disk_evictions += 1
+                evicted.append(key)
+        for key in evicted:
+            self._remove_file(key)
+
+    def _load_disk_index(self):
+        files = []
+        for name in os.listdir(self.disk_dir):
+            path = os.path.join(self.disk_dir, name)
+            if name.endswith('.tmp'):
+                self._unlink(path)  # Left behind by an interrupted write
+            elif name.endswith('.pdf'):
+                stat = os.stat(path)
+                files.append((stat.st_atime, name[:-4], stat.st_size))
+        for _, key, size in sorted(files):
+            self.disk_entries[key] = size
+            self.disk_bytes += size
+
+    def _path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.pdf")
+
+    def _remove_file(self, key):
+        self._unlink(self._path(key))
+
+    @staticmethod
+    def _unlink(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass